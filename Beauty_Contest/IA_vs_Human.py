@@ -1,79 +1,82 @@
 import tkinter as tk
 from tkinter import messagebox
-import random
-import math
-import pickle
-import numpy as np
+import argparse
 
-MULTIPLIERS = [0.5,0.6,0.7,0.8,0.9,1.1,1.2,1.3,1.4,1.5]
-DEFAULT_ROUND_TIME = 20
-N_ACTIONS = 21  # pour les IA
+from analyse import best_response, uniform
+from classement import CLASSEMENT_PATH, Leaderboard
+from journal import JOURNAL_PATH, GameLog
+from modele import preload
+from politique import get_policies
+from moteur import NO_CHOICE, RULES, GameState, RuleSet, Seat, choose_action, draw_multiplier, new_rng, new_seed
 
-# Charger le modèle RL
-with open("modele_ia_beauty_contest", "rb") as f:
-    history_list = pickle.load(f)
-latest_q_tables = history_list[-1]  # dernier épisode
+DEFAULT_ROUND_TIME = 20
 
 def discretize_choice(choice):
     return int(round(choice/5)*5)
 
-class Player:
-    def __init__(self, name, lives, q_table=None):
-        self.name = name
-        self.lives = lives
+class Player(Seat):
+    def __init__(self, state, index, q_table=None):
+        super().__init__(state, index)
         self.q_table = q_table
-        self.last_choice = None
-        self._was_elim = False
-
-    def get_state(self, multiplier, round_number, lives_list):
-        mean_others = int(sum(lives_list)/len(lives_list)) if lives_list else 0
-        mult_disc = int(multiplier*10)
-        return (self.lives, mean_others, mult_disc, round_number)
-
-    def choose_ai_action(self, state, banned=set(), epsilon=0):
-        if not self.q_table or random.random() < epsilon or state not in self.q_table:
-            choice = random.choice([i*5 for i in range(N_ACTIONS) if i*5 not in banned] or [i*5 for i in range(N_ACTIONS)])
-        else:
-            q_vals = self.q_table[state]
-            possible = [i*5 for i in range(N_ACTIONS) if i*5 not in banned]
-            if not possible: possible = [i*5 for i in range(N_ACTIONS)]
-            choice = max(possible, key=lambda x: q_vals[x//5])
+
+    def choose_ai_action(self, state, banned=set(), epsilon=0, rng=None):
+        choice = choose_action(self.q_table, state, banned, epsilon, rng)
         self.last_choice = choice
         return choice
 
 class Game:
-    def __init__(self, root):
+    def __init__(self, root, model_path=None, snapshot=-1, journal_path=None, seed=None, classement_path=None):
         self.root = root
+        # Modèle RL chargé en tâche de fond pendant l'écran d'accueil
+        self.model_path = model_path
+        self.snapshot = snapshot
+        preload(model_path, snapshot, get_policies)
         self.root.title("Beauty Contest - Humain vs IA")
         self.players = []
+        self.state = GameState([], 0)
         self.round_time = DEFAULT_ROUND_TIME
-        self.base_multiplier = random.choice(MULTIPLIERS)
+        self.next_seed = seed  # graine imposée pour la première partie
+        self.new_rng()
         self.current_multiplier = self.base_multiplier
-        self.active_rules = []
-        self.all_rules = [1,2,3,4,5,6]
+        self.active_rules = RuleSet()
         self.banned_numbers = set()
         self.round_number = 0
         self.timer_id = None
         self.countdown = 0
+        self.journal = GameLog(journal_path, Leaderboard(classement_path))  # journal et classement (LMS_JOURNAL, LMS_CLASSEMENT)
+        self.record = None
         self.setup_start_screen()
 
+    def new_rng(self):
+        # Générateur de la partie : tirages du jeu et coups des IA
+        self.seed = new_seed() if self.next_seed is None else self.next_seed
+        self.next_seed = None
+        self.rng = new_rng(self.seed)
+        self.base_multiplier = draw_multiplier(self.rng)
+
     def setup_start_screen(self):
         for w in self.root.winfo_children(): w.destroy()
         frame = tk.Frame(self.root,padx=10,pady=10); frame.pack()
         tk.Label(frame,text="Temps par manche (s) :").grid(row=0,column=0,sticky='w')
         self.time_var = tk.IntVar(value=DEFAULT_ROUND_TIME)
         tk.Entry(frame,textvariable=self.time_var,width=6).grid(row=0,column=1,sticky='w')
-        tk.Button(frame,text="Démarrer la partie",command=self.start_game).grid(row=1,column=0,columnspan=2,pady=(10,0))
+        tk.Label(frame,text=f"Graine de la partie : {self.seed}").grid(row=1,column=0,columnspan=2,sticky='w')
+        tk.Button(frame,text="Démarrer la partie",command=self.start_game).grid(row=2,column=0,columnspan=2,pady=(10,0))
 
     def start_game(self):
+        try: latest_q_tables = get_policies(self.model_path, self.snapshot)
+        except (OSError, ValueError, IndexError) as e: messagebox.showerror("Erreur", f"Modèle RL introuvable: {e}"); return
         lives = 10
-        human = Player("Vous", lives)
         # Ajouter 4 IA avec Q-table
-        ia_players = [Player(name, lives, latest_q_tables[name]) for name in latest_q_tables.keys() if name != "Vous"]
-        self.players = [human]+ia_players[:4]
+        ia_names = [name for name in latest_q_tables.keys() if name != "Vous"][:4]
+        self.state = GameState(["Vous"]+ia_names, lives)
+        self.record = self.journal.game('ia_vs_humain', self.state.names, lives, self.seed, [None]+ia_names)
+        human = Player(self.state, 0)
+        ia_players = [Player(self.state, i+1, latest_q_tables[name]) for i,name in enumerate(ia_names)]
+        self.players = [human]+ia_players
         self.round_time = max(7,int(self.time_var.get()))
         self.current_multiplier = self.base_multiplier
-        self.active_rules = []
+        self.active_rules = RuleSet()
         self.round_number = 0
         self.setup_game_screen()
 
@@ -90,7 +93,7 @@ class Game:
             var = tk.StringVar(); ent = tk.Entry(row,textvariable=var,width=6); ent.pack(side='left')
             self.entries.append(var); self.entry_widgets.append(ent)
             if p.q_table: ent.config(state="disabled")  # IA ne modifie pas
-            tk.Button(row,text="Auto",command=lambda v=var: v.set(str(random.randint(0,100)))).pack(side='left')
+            tk.Button(row,text="Auto",command=lambda v=var: v.set(str(self._suggest_choice()))).pack(side='left')
 
         self.right_frame = tk.Frame(self.root,padx=8,pady=8); self.right_frame.pack(side="right",fill="y")
         self.banned_label = tk.Label(self.right_frame,text="Nombres interdits :",font=("Arial",10,"bold")); self.banned_label.pack(anchor="n")
@@ -126,9 +129,8 @@ class Game:
         if self.round_number==5 and not self.active_rules and self._alive_players_count()>2:
             self.log_msg("Activation forcée d'une règle à la manche 5")
             self._add_random_rule()
-        if 1 in self.active_rules: self.current_multiplier=random.choice(MULTIPLIERS)
-        self.countdown = random.randint(7,30) if 4 in self.active_rules else self.round_time
-        self.banned_numbers = set(random.sample(range(0,101),20)) if 6 in self.active_rules else set()
+        setup = self.active_rules.pre_round(self.current_multiplier, self.round_time, self.rng)
+        self.current_multiplier, self.countdown, self.banned_numbers = setup.multiplier, setup.round_time, setup.banned
         for v in self.entries: v.set("")
         self.log_msg(f"--- Manche {self.round_number} démarrée (multiplier: {self.current_multiplier}, temps: {self.countdown}s) ---")
         self.update_ui(); self.round_button.config(state='disabled'); self._tick()
@@ -145,65 +147,64 @@ class Game:
             p=self.players[i]
             if p.lives<=0: continue
             if p.q_table:
-                alive=[pl for pl in self.players if pl.lives>0 and pl!=p]
-                state=p.get_state(self.current_multiplier,self.round_number,[pl.lives for pl in alive])
-                p.choose_ai_action(state,self.banned_numbers)
+                state=p.get_state(self.current_multiplier,self.round_number)
+                p.choose_ai_action(state,self.banned_numbers,rng=self.rng)
             else:
                 try: val=int(var.get().strip())
                 except: val=None
                 if val is None or val<0 or val>100 or val in self.banned_numbers:
-                    val=random.randint(0,100)
+                    val=int(self.rng.integers(0,101))
                     self.log_msg(f"{p.name} choix invalide → {val} attribué")
                 p.last_choice=val
             choices.append(p.last_choice)
 
-        avg=sum(choices)/len(choices)
-        target_real=avg*self.current_multiplier
-        target=int(round(target_real))
-        self.log_msg(f"Choix: {choices} | Moyenne x multiplicateur = {target_real:.2f} -> arrondi {target}")
-        # distances et gagnants
-        alive_players=[p for p in self.players if p.lives>0]
-        distances={p:abs(p.last_choice-target) for p in alive_players}
-        min_dist=min(distances.values()); winners=[p for p,d in distances.items() if d==min_dist]
-        if 2 in self.active_rules and self._alive_players_count()>2:
-            max_dist=max(distances.values()); far_players=[p for p,d in distances.items() if d==max_dist]; winners=list(set(winners+far_players))
-        for p in alive_players:
-            if p not in winners: p.lives-=1
+        seat_choices=[p.last_choice if p.lives>0 else NO_CHOICE for p in self.players]
+        res=self.state.resolve(self.state.last_choice,self.current_multiplier,self.active_rules)
+        self.record.round(self.round_number,self.current_multiplier,self.active_rules,self.banned_numbers,seat_choices,self.state.lives)
+        self.log_msg(f"Choix: {choices} | Moyenne x multiplicateur = {res.target_real:.2f} -> arrondi {res.target}")
         self._post_round_cleanup()
 
     def _post_round_cleanup(self):
         for p in self.players: self.log_msg(f"{p.name} -> vies: {p.lives}")
         if self._alive_players_count()>2:
-            newly_elim=[p for p in self.players if p.lives<=0 and not p._was_elim]
-            for p in newly_elim: p._was_elim=True; self.log_msg(f"{p.name} éliminé"); self._add_random_rule()
+            for i in self.state.newly_eliminated(): self.log_msg(f"{self.players[i].name} éliminé"); self._add_random_rule()
         self.round_button.config(state='normal'); self.update_ui()
         if self._alive_players_count()<=1: self.end_game()
 
+    def _suggest_choice(self):
+        # Meilleure réponse face à des adversaires uniformes (analyse.py), comme Local_Game :
+        # aucun tirage, le générateur de la partie n'est pas décalé par les clics
+        return best_response(uniform(),self._alive_players_count()-1,self.current_multiplier,self.active_rules,self.banned_numbers)
+
     def _add_random_rule(self):
-        remaining=[r for r in self.all_rules if r not in self.active_rules]
-        if not remaining: return
-        new=random.choice(remaining); self.active_rules.append(new)
+        new=self.state.activate_rule(self.active_rules,self.rng)
+        if new is None: return
+        self.record.rule(self.round_number,new)
         self.log_msg(f"Nouvelle règle activée: {new}")
-        if new==5: 
-            for p in self.players:
-                if p.lives>0: p.lives=math.ceil(p.lives/2)
-            self.log_msg("Application immédiate de la règle 5: vies divisées par 2")
-        if new==1: self.current_multiplier=random.choice(MULTIPLIERS)
+        if RULES[new].announce: self.log_msg(RULES[new].announce)
         self.update_ui()
 
-    def _alive_players_count(self): return sum(1 for p in self.players if p.lives>0)
+    def _alive_players_count(self): return self.state.alive_count()
     def log_msg(self,msg): self.log.config(state='normal'); self.log.insert('end',msg+'\n'); self.log.see('end'); self.log.config(state='disabled')
 
     def end_game(self):
         winners=[p for p in self.players if p.lives>0]
+        self.record.end(self.round_number,winners[0].index if len(winners)==1 else None)
         if not winners: msg="Aucun gagnant (égalité)"
         elif len(winners)==1: msg=f"{winners[0].name} gagne !"
         else: msg=f"Gagnants: {', '.join(p.name for p in winners)}"
         self.log_msg(msg); messagebox.showinfo("Fin",msg)
-        if messagebox.askyesno("Rejouer?","Voulez-vous lancer une nouvelle partie ?"): self.base_multiplier=random.choice(MULTIPLIERS); self.setup_start_screen()
+        if messagebox.askyesno("Rejouer?","Voulez-vous lancer une nouvelle partie ?"): self.new_rng(); self.setup_start_screen()
         else: self.root.quit()
 
 if __name__=='__main__':
+    parser=argparse.ArgumentParser(description="Beauty Contest - Humain vs IA")
+    parser.add_argument('--model',default=None,help="modèle RL (dense ou historique picklé)")
+    parser.add_argument('--snapshot',type=int,default=-1,help="indice du snapshot, -1 = dernier")
+    parser.add_argument('--journal',nargs='?',const=JOURNAL_PATH,default=None,help="journal des parties (désactivé par défaut ; sans valeur : parties.journal)")
+    parser.add_argument('--seed',type=int,default=None,help="graine de la première partie (aléatoire par défaut)")
+    parser.add_argument('--classement',nargs='?',const=CLASSEMENT_PATH,default=None,help="base SQLite du classement (désactivé par défaut ; sans valeur : classement.db)")
+    args=parser.parse_args()
     root=tk.Tk()
-    game=Game(root)
+    game=Game(root,args.model,args.snapshot,args.journal,args.seed,args.classement)
     root.mainloop()
@@ -1,34 +1,43 @@
 import tkinter as tk
 from tkinter import messagebox
-import random
-import math
+import argparse
+
+from analyse import best_response, uniform
+from classement import CLASSEMENT_PATH, Leaderboard
+from journal import JOURNAL_PATH, GameLog
+from moteur import NO_CHOICE, RULES, GameState, RuleSet, Seat, draw_multiplier, new_rng, new_seed
 
-MULTIPLIERS = [0.5,0.6,0.7,0.8,0.9,1.1,1.2,1.3,1.4,1.5]
 DEFAULT_ROUND_TIME = 20  # secondes par défaut
 
-class Player:
-    def __init__(self, name, lives):
-        self.name = name
-        self.lives = lives
-        self.last_choice = None
-        self._was_elim = False
+class Player(Seat):
+    pass
 
 class Game:
-    def __init__(self, root):
+    def __init__(self, root, seed=None, journal_path=None, classement_path=None):
         self.root = root
         self.root.title("Jeu multijoueur - hotseat")
         self.players = []
+        self.state = GameState([], 0)
         self.round_time = DEFAULT_ROUND_TIME
-        self.base_multiplier = random.choice(MULTIPLIERS)
+        self.next_seed = seed  # graine imposée pour la première partie
+        self.new_rng()
         self.current_multiplier = self.base_multiplier
-        self.active_rules = []
-        self.all_rules = [1,2,3,4,5,6]  # uniquement 1..6
+        self.active_rules = RuleSet()
         self.banned_numbers = set()
         self.round_number = 0
         self.timer_id = None
         self.countdown = 0
+        self.journal = GameLog(journal_path, Leaderboard(classement_path))  # journal et classement (LMS_JOURNAL, LMS_CLASSEMENT)
+        self.record = None
         self.setup_start_screen()
 
+    def new_rng(self):
+        # Générateur de la partie : tous ses tirages en dépendent
+        self.seed = new_seed() if self.next_seed is None else self.next_seed
+        self.next_seed = None
+        self.rng = new_rng(self.seed)
+        self.base_multiplier = draw_multiplier(self.rng)
+
     def setup_start_screen(self):
         for w in self.root.winfo_children():
             w.destroy()
@@ -44,6 +53,7 @@ class Game:
         tk.Entry(frame, textvariable=self.time_var, width=6).grid(row=1,column=1,sticky='w')
 
         tk.Label(frame, text=f"Multiplicateur initial (tiré aléatoirement) : {self.base_multiplier}").grid(row=2,column=0,columnspan=2,sticky='w',pady=(10,0))
+        tk.Label(frame, text=f"Graine de la partie : {self.seed}").grid(row=3,column=0,columnspan=2,sticky='w')
 
         tk.Button(frame, text="Démarrer la partie", command=self.start_game).grid(row=4,column=0,columnspan=2,pady=(10,0))
 
@@ -52,18 +62,18 @@ class Game:
         if n < 2:
             messagebox.showerror("Erreur","Il faut au moins 2 joueurs")
             return
-        self.players = []
         if n <= 3:
             lives = 10
         elif n >= 6:
             lives = 15
         else:
             lives = n*3-2
-        for i in range(1, n+1):
-            self.players.append(Player(f"Joueur {i}", lives))
+        self.state = GameState([f"Joueur {i}" for i in range(1, n+1)], lives)
+        self.record = self.journal.game('local', self.state.names, lives, self.seed)
+        self.players = [Player(self.state, i) for i in range(n)]
         self.round_time = max(7, int(self.time_var.get()))
         self.current_multiplier = self.base_multiplier
-        self.active_rules = []
+        self.active_rules = RuleSet()
         self.round_number = 0
         self.setup_game_screen()
 
@@ -92,7 +102,7 @@ class Game:
             ent.pack(side='left')
             self.entries.append(var)
             self.entry_widgets.append(ent)
-            tk.Button(row, text="Auto", command=lambda v=var: v.set(str(random.randint(0,100)))).pack(side='left')
+            tk.Button(row, text="Auto", command=lambda v=var: v.set(str(self._suggest_choice()))).pack(side='left')
 
         # Partie milieu droite : nombres interdits
         self.right_frame = tk.Frame(self.root, padx=8, pady=8)
@@ -154,21 +164,9 @@ class Game:
             self.log_msg("Aucune règle active à la manche 5 → activation forcée d'une règle.")
             self._add_random_rule()
 
-        # Règle 1 : changer multiplicateur chaque manche
-        if 1 in self.active_rules:
-            self.current_multiplier = random.choice(MULTIPLIERS)
-
-        # Règle 4 : temps aléatoire
-        if 4 in self.active_rules:
-            self.countdown = random.randint(7,30)
-        else:
-            self.countdown = self.round_time
-
-        # Règle 6 : nombres interdits
-        if 6 in self.active_rules:
-            self.banned_numbers = set(random.sample(range(0,101), 20))
-        else:
-            self.banned_numbers = set()
+        # Règles actives : multiplicateur (1), temps (4), nombres interdits (6)
+        setup = self.active_rules.pre_round(self.current_multiplier, self.round_time, self.rng)
+        self.current_multiplier, self.countdown, self.banned_numbers = setup.multiplier, setup.round_time, setup.banned
 
         for v in self.entries:
             v.set("")
@@ -202,72 +200,34 @@ class Game:
             except:
                 val = None
             if val is None or val < 0 or val > 100 or val in self.banned_numbers:
-                val = random.randint(0,100)
+                val = int(self.rng.integers(0, 101))
                 self.log_msg(f"{p.name} n'a pas donné de choix valide; choix aléatoire {val} attribué")
             p.last_choice = val
             choices.append(val)
 
         if not choices:
             return
+        seat_choices = [p.last_choice if p.lives > 0 else NO_CHOICE for p in self.players]
+        res = self.state.resolve(self.state.last_choice, self.current_multiplier, self.active_rules)
+        self.record.round(self.round_number, self.current_multiplier, self.active_rules, self.banned_numbers, seat_choices, self.state.lives)
         avg = sum(choices)/len(choices)
-        target_real = avg * self.current_multiplier
-        target = int(round(target_real))
         self.log_msg(f"Choix: {choices}")
-        self.log_msg(f"Moyenne: {avg:.2f} -> x {self.current_multiplier} = {target_real:.2f} arrondi => {target}")
-
-        # Cas spécial duel final
-        if self._alive_players_count() == 2:
-            alive = [p for p in self.players if p.lives > 0]
-            c1, c2 = alive[0].last_choice, alive[1].last_choice
-            if self.current_multiplier < 1 and {c1,c2} == {0,100}:
-                winner = alive[0] if c1 == 100 else alive[1]
-                self.log_msg(f"Règle duel: {winner.name} gagne la manche (100 vs 0 avec multiplicateur <1)")
-                loser = alive[0] if winner==alive[1] else alive[1]
-                loser.lives -= 1
-                self._post_round_cleanup()
-                return
-            elif self.current_multiplier > 1 and {c1,c2} == {0,100}:
-                winner = alive[0] if c1 == 0 else alive[1]
-                self.log_msg(f"Règle duel: {winner.name} gagne la manche (0 vs 100 avec multiplicateur >1)")
-                loser = alive[0] if winner==alive[1] else alive[1]
-                loser.lives -= 1
-                self._post_round_cleanup()
-                return
-
-        # Règle 3 : exact
-        exact_players = [p for p in self.players if p.last_choice == target and p.lives>0]
-        if exact_players and 3 in self.active_rules:
-            self.log_msg(f"Exact trouvé par: {', '.join(p.name for p in exact_players)} -> ces joueurs ne perdent pas, les autres perdent 2 vies")
-            for p in self.players:
-                if p.lives > 0 and p not in exact_players:
-                    p.lives -= 2
-            self._post_round_cleanup()
-            return
+        self.log_msg(f"Moyenne: {avg:.2f} -> x {self.current_multiplier} = {res.target_real:.2f} arrondi => {res.target}")
 
-        # distances
-        alive_players = [p for p in self.players if p.lives>0]
-        distances = {p: abs(p.last_choice - target) for p in alive_players}
-        if not distances:
-            self.end_game()
-            return
-        min_dist = min(distances.values())
-        winners = [p for p,d in distances.items() if d==min_dist]
-
-        if 2 in self.active_rules and self._alive_players_count() > 2:
-            max_dist = max(distances.values())
-            far_players = [p for p,d in distances.items() if d==max_dist]
-            winners = list(set(winners + far_players))
-
-        self.log_msg(f"Joueur(s) les plus proches: {', '.join(p.name for p in winners)}")
-        for p in alive_players:
-            if p not in winners:
-                p.lives -= 1
-
-        if 5 in self.active_rules:
-            self.log_msg("Règle 5 active: division des vies par 2 (arrondi supérieur)")
-            for p in self.players:
-                if p.lives > 0:
-                    p.lives = math.ceil(p.lives / 2)
+        winners = [p for p in self.players if res.winners[p.index]]
+        if res.duel:
+            # Cas spécial duel final
+            if self.current_multiplier < 1:
+                self.log_msg(f"Règle duel: {winners[0].name} gagne la manche (100 vs 0 avec multiplicateur <1)")
+            else:
+                self.log_msg(f"Règle duel: {winners[0].name} gagne la manche (0 vs 100 avec multiplicateur >1)")
+        elif res.exact.any():
+            # Règle 3 : exact
+            self.log_msg(f"Exact trouvé par: {', '.join(p.name for p in winners)} -> ces joueurs ne perdent pas, les autres perdent 2 vies")
+        else:
+            self.log_msg(f"Joueur(s) les plus proches: {', '.join(p.name for p in winners)}")
+            if res.halved:
+                self.log_msg("Règle 5 active: division des vies par 2 (arrondi supérieur)")
 
         self._post_round_cleanup()
 
@@ -276,9 +236,8 @@ class Game:
             self.log_msg(f"{p.name} -> vies: {p.lives}")
         # plus d'ajout de règle si seulement 2 joueurs vivants
         if self._alive_players_count() > 2:
-            newly_eliminated = [p for p in self.players if p.lives <= 0 and not p._was_elim]
-            for p in newly_eliminated:
-                p._was_elim = True
+            for i in self.state.newly_eliminated():
+                p = self.players[i]
                 self.log_msg(f"{p.name} est éliminé ! Une nouvelle règle va être ajoutée.")
                 self._add_random_rule()
         self.round_button.config(state='normal')
@@ -287,36 +246,22 @@ class Game:
             self.end_game()
 
     def _add_random_rule(self):
-        remaining = [r for r in self.all_rules if r not in self.active_rules]
-        if not remaining:
+        new = self.state.activate_rule(self.active_rules, self.rng)
+        if new is None:
             self.log_msg("Toutes les règles sont déjà actives.")
             return
-        new = random.choice(remaining)
-        self.active_rules.append(new)
-        self.log_msg(f"Nouvelle règle activée: {new} -> {self._rule_text(new)}")
-        if new == 5:
-            for p in self.players:
-                if p.lives > 0:
-                    p.lives = math.ceil(p.lives / 2)
-            self.log_msg("Application immédiate de la règle 5: vies divisées par 2")
-        if new == 1:
-            self.current_multiplier = random.choice(MULTIPLIERS)
-            self.log_msg(f"Multiplicateur changé maintenant: {self.current_multiplier}")
+        self.record.rule(self.round_number, new)
+        self.log_msg(f"Nouvelle règle activée: {new} -> {RULES[new].text}")
+        if RULES[new].announce:
+            self.log_msg(RULES[new].announce)
         self.update_ui()
 
-    def _rule_text(self, r):
-        texts = {
-            1: "La valeur multiplicative change chaque round",
-            2: "Les joueurs les plus éloignés sont aussi protégés (sauf si seulement 2 joueurs restants)",
-            3: "Si un joueur obtient la valeur exacte, les autres perdent 2 vies",
-            4: "Le temps de réflexion devient aléatoire entre 7 et 30s",
-            5: "Les vies de tous les joueurs sont divisées par 2 (arrondi supérieur)",
-            6: "20 nombres aléatoires (0..100) sont interdits chaque round"
-        }
-        return texts.get(r, '')
+    def _suggest_choice(self):
+        # Meilleure réponse face à des adversaires uniformes (analyse.py)
+        return best_response(uniform(), self._alive_players_count() - 1, self.current_multiplier, self.active_rules, self.banned_numbers)
 
     def _alive_players_count(self):
-        return sum(1 for p in self.players if p.lives > 0)
+        return self.state.alive_count()
 
     def log_msg(self, msg):
         self.log.config(state='normal')
@@ -326,6 +271,7 @@ class Game:
 
     def end_game(self):
         winners = [p for p in self.players if p.lives > 0]
+        self.record.end(self.round_number, winners[0].index if len(winners) == 1 else None)
         if not winners:
             self.log_msg("Fin de la partie: aucun gagnant (égalité) !")
             messagebox.showinfo("Fin","Aucun gagnant — égalité")
@@ -336,12 +282,17 @@ class Game:
             self.log_msg(f"Fin de la partie: plusieurs gagnants: {', '.join(p.name for p in winners)}")
             messagebox.showinfo("Fin", f"Gagnants: {', '.join(p.name for p in winners)}")
         if messagebox.askyesno("Rejouer?","Voulez-vous lancer une nouvelle partie ?"):
-            self.base_multiplier = random.choice(MULTIPLIERS)
+            self.new_rng()
             self.setup_start_screen()
         else:
             self.root.quit()
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Jeu multijoueur - hotseat")
+    parser.add_argument('--seed', type=int, default=None, help="graine de la première partie (aléatoire par défaut)")
+    parser.add_argument('--journal', nargs='?', const=JOURNAL_PATH, default=None, help="journal des parties (désactivé par défaut ; sans valeur : parties.journal)")
+    parser.add_argument('--classement', nargs='?', const=CLASSEMENT_PATH, default=None, help="base SQLite du classement (désactivé par défaut ; sans valeur : classement.db)")
+    args = parser.parse_args()
     root = tk.Tk()
-    game = Game(root)
+    game = Game(root, args.seed, args.journal, args.classement)
     root.mainloop()
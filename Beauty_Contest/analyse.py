@@ -0,0 +1,237 @@
+# === analyse.py ===
+# Meilleure réponse : perte de vies espérée de chaque action 0..100, pour
+# chaque multiplicateur, face à des adversaires qui jouent selon une
+# distribution donnée (101 probabilités, la même pour chacun).
+#
+# Calcul exact, vectorisé : pour une action et un multiplicateur, la cible
+# rint((action + somme adverse) / joueurs x multiplicateur) est constante
+# sur des intervalles de sommes. Dans chaque intervalle, "personne n'est
+# plus proche" (ou plus loin, règle 2 ; personne pile, règle 3) veut dire
+# "tous les adversaires dans un ensemble de choix" ; la loi jointe de la
+# somme et de cet événement est la puissance n de la distribution
+# restreinte à l'ensemble, calculée par FFT, une fois par ensemble
+# distinct. Règles du moteur : plus proche(s), règle 2 (plus éloignés
+# protégés, plus de 2 joueurs), règle 3 (valeur exacte, les autres perdent
+# 2 vies), duel 0/100. La règle 5 (vies divisées) n'est pas modélisée.
+# --check compare avec des parties jouées par moteur.resolve_round.
+#
+#   python analyse.py --opponents 4 --rules 2 3
+#   python analyse.py --opponents 4 --check 20000
+import argparse
+import time
+from functools import lru_cache
+from math import comb
+
+import numpy as np
+
+from moteur import MULTIPLIERS, has_rule, new_rng, resolve_round, rules_mask
+
+N_VALUES = 101  # choix possibles 0..100
+CHUNK = 256  # ensembles calculés ensemble (tableaux qui restent en cache)
+
+
+def uniform():
+    return np.full(N_VALUES, 1 / N_VALUES)
+
+
+def from_choices(choices):
+    # Distribution empirique de choix observés (0..100, NO_CHOICE ignoré)
+    choices = np.asarray(choices)
+    counts = np.bincount(choices[choices >= 0], minlength=N_VALUES)[:N_VALUES]
+    return counts / max(counts.sum(), 1)
+
+
+def sum_distribution(p, n):
+    # Loi de la somme de n choix indépendants de loi p
+    size = (N_VALUES - 1) * n + 1
+    fft_size = 1 << (size - 1).bit_length()
+    dist = np.fft.irfft(np.fft.rfft(p, fft_size) ** n, fft_size)[:size]
+    return np.clip(dist, 0, None)
+
+
+def _power(z, n):
+    # z ** n par carrés successifs (bien plus rapide que ** sur des complexes)
+    result = None
+    while n:
+        if n & 1:
+            result = z if result is None else result * z
+        n >>= 1
+        if n:
+            z = z * z
+    return result
+
+
+class _Sets:
+    # Lois jointes "tous les adversaires dans un ensemble de choix, somme s".
+    # Le spectre de p restreint à un intervalle est une différence de sommes
+    # cumulées des termes p[x] e^(-2i pi x f / N) : pas de FFT directe.
+    def __init__(self, p, n):
+        self.n = n
+        self.size = (N_VALUES - 1) * n + 1
+        self.fft_size = 1 << (self.size - 1).bit_length()
+        x = np.arange(N_VALUES)[:, None]
+        self.terms = p[:, None] * np.exp(-2j * np.pi * x * np.arange(self.fft_size // 2 + 1) / self.fft_size)
+        self.cumulative = np.zeros((N_VALUES + 1, self.terms.shape[1]), dtype=np.complex128)
+        np.cumsum(self.terms, axis=0, out=self.cumulative[1:])
+        self.total = self.cumulative[-1]
+
+    def inside(self, lo, hi):
+        # choix dans [lo, hi]
+        lo, hi = np.clip(lo, 0, N_VALUES), np.clip(hi + 1, 0, N_VALUES)
+        return self.cumulative[np.maximum(hi, lo)] - self.cumulative[lo]
+
+    def point(self, v):
+        return np.where(((v >= 0) & (v < N_VALUES))[:, None], self.terms[np.clip(v, 0, N_VALUES - 1)], 0)
+
+    def window_sums(self, keys, spectra, lo, hi):
+        # Pour chaque entrée e : somme sur s dans [lo[e], hi[e]] de la loi
+        # jointe de l'ensemble keys[e] ; spectra(clés) donne les spectres.
+        # Un calcul par clé distincte, par paquets de CHUNK ensembles.
+        sets, row = np.unique(keys, return_inverse=True)
+        order = np.argsort(row, kind='stable')
+        starts = np.arange(0, len(sets) + CHUNK, CHUNK)
+        bounds = np.searchsorted(row[order], starts)
+        out = np.empty(len(keys))
+        for start, first, last in zip(starts[:-1], bounds[:-1], bounds[1:]):
+            e = order[first:last]
+            dist = np.fft.irfft(_power(spectra(sets[start:start + CHUNK]), self.n), self.fft_size)
+            cum = np.cumsum(dist[:, :self.size], axis=1)
+            r = row[e] - start
+            out[e] = cum[r, hi[e]] - np.where(lo[e] > 0, cum[r, lo[e] - 1], 0)
+        return out
+
+
+def _interval_key(lo, hi):
+    # [lo, hi] ramené à 0..100 (vide si lo > hi), en un entier
+    return np.clip(lo, 0, N_VALUES) * (N_VALUES + 2) + np.clip(hi, -1, N_VALUES - 1) + 1
+
+
+def _key_interval(key):
+    return key // (N_VALUES + 2), key % (N_VALUES + 2) - 1
+
+
+def action_values(p, n_opponents, rules=0, multipliers=MULTIPLIERS):
+    # (len(multipliers), 101) : vies perdues en moyenne par action, contre
+    # n_opponents adversaires de loi p ; rules : masque ou RuleSet
+    p = np.asarray(p, dtype=np.float64)
+    p = p / p.sum()
+    rules = rules_mask(rules) if not isinstance(rules, (int, np.integer)) else int(rules)
+    if n_opponents < 1:
+        return np.zeros((len(multipliers), N_VALUES))
+    far_rule = bool(has_rule(rules, 2)) and n_opponents > 1
+    exact_rule = bool(has_rule(rules, 3))
+    key = (p.tobytes(), n_opponents, far_rule, exact_rule, tuple(float(m) for m in multipliers))
+    return _action_values(*key).copy()
+
+
+@lru_cache(maxsize=64)
+def _action_values(p_bytes, n, far_rule, exact_rule, mults):
+    # Table en cache : seules les règles 2 et 3 changent les pertes
+    p = np.frombuffer(p_bytes)
+    mults = np.asarray(mults)
+    sets = _Sets(p, n)
+
+    # Cible de chaque (multiplicateur, action, somme adverse) ; pour une
+    # action et un multiplicateur, chaque cible couvre un intervalle
+    # [lo, hi] de sommes. Écart nul : l'action est la cible, aucune perte.
+    s = np.arange(sets.size)
+    a = np.arange(N_VALUES)[:, None]
+    target = np.rint((a + s)[None] / (n + 1) * mults[:, None, None]).astype(np.int64)
+    first = np.ones(target.shape, dtype=bool)
+    first[..., 1:] = target[..., 1:] != target[..., :-1]
+    mi, ai, lo = np.nonzero(first)
+    t = target[mi, ai, lo]
+    last = np.append((mi[1:] != mi[:-1]) | (ai[1:] != ai[:-1]), True)
+    hi = np.where(last, sets.size - 1, np.append(lo[1:], 0) - 1)
+    d = np.abs(ai - t)
+    keep = d > 0
+    mi, ai, lo, hi, t, d = mi[keep], ai[keep], lo[keep], hi[keep], t[keep], d[keep]
+
+    reached = np.cumsum(sum_distribution(p, n))
+    reached = reached[hi] - np.where(lo > 0, reached[lo - 1], 0)
+    if exact_rule:
+        # Règle 3 : un adversaire pile sur la cible fait perdre 2 vies
+        no_exact = sets.window_sums(t, lambda k: sets.total - sets.point(k), lo, hi)
+        reached = 2 * (reached - no_exact) + no_exact
+
+    def outside(k):
+        return sets.total - sets.inside(*_key_interval(k))
+
+    # protégé si aucun adversaire n'est strictement plus proche de la cible
+    protected = sets.window_sums(_interval_key(t - d + 1, t + d - 1), outside, lo, hi)
+    if far_rule:
+        # Règle 2 : protégé aussi si personne n'est plus éloigné ;
+        # "tous à égalité" serait compté deux fois
+        if exact_rule:
+            # sans adversaire sur la cible (déjà compté à part)
+            keys = _interval_key(t - d, t + d) * (2 * N_VALUES) + np.where(t < N_VALUES, t, N_VALUES)
+            farther = sets.window_sums(keys, lambda k: sets.inside(*_key_interval(k // (2 * N_VALUES))) - sets.point(k % (2 * N_VALUES)), lo, hi)
+        else:
+            farther = sets.window_sums(_interval_key(t - d, t + d), lambda k: sets.inside(*_key_interval(k)), lo, hi)
+        # tous à égalité : j adversaires en t - d, les autres en t + d
+        j = np.arange(n + 1)
+        tied_sums = (t - d)[:, None] * j + (t + d)[:, None] * (n - j)
+        low, high = (np.where((v >= 0) & (v < N_VALUES), p[np.clip(v, 0, N_VALUES - 1)], 0) for v in (t - d, t + d))
+        weight = np.array([comb(n, k) for k in j]) * low[:, None] ** j * high[:, None] ** (n - j)
+        tied = np.where((tied_sums >= lo[:, None]) & (tied_sums <= hi[:, None]), weight, 0).sum(axis=1)
+        protected += farther - tied
+
+    values = np.zeros((len(mults), N_VALUES))
+    np.add.at(values, (mi, ai), reached - protected)
+    if n == 1:
+        # duel final 0 contre 100 (s est alors le choix adverse) : remplace
+        # la perte normale de ces deux cas
+        for i, m in enumerate(mults):
+            if m == 1:
+                continue
+            pick = 100 if m < 1 else 0
+            for mine, other in ((0, 100), (100, 0)):
+                target_duel = int(np.rint((mine + other) / 2 * m))
+                normal = 2 if exact_rule and other == target_duel else int(abs(other - target_duel) < abs(mine - target_duel))
+                values[i, mine] += p[other] * ((mine != pick) - normal)
+    return values
+
+
+def best_response(p, n_opponents, multiplier, rules=0, banned=()):
+    # Action de perte espérée minimale (la plus petite en cas d'égalité)
+    values = action_values(p, n_opponents, rules, [multiplier])[0]
+    values[list(banned)] = np.inf
+    return int(values.argmin())
+
+
+def check(p, n_opponents, multiplier, rules, n_games, rng):
+    # Pertes moyennes mesurées avec le moteur, adversaires tirés selon p
+    p = np.asarray(p) / np.sum(p)
+    mask = rules_mask(rules) if not isinstance(rules, int) else rules
+    opponents = rng.choice(N_VALUES, (n_games, n_opponents), p=p)
+    lives = np.full((n_games, n_opponents + 1), 10)
+    measured = np.empty(N_VALUES)
+    for a in range(N_VALUES):
+        choices = np.column_stack([np.full(n_games, a), opponents])
+        res = resolve_round(lives, choices, multiplier, mask)
+        measured[a] = (lives[:, 0] - res.lives[:, 0]).mean()
+    return measured
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Meilleure réponse face à des adversaires uniformes")
+    parser.add_argument('--opponents', type=int, default=4)
+    parser.add_argument('--rules', type=int, nargs='*', default=[], help="règles actives (2 et 3 changent les pertes)")
+    parser.add_argument('--check', type=int, default=0, metavar='N', help="compare avec N parties jouées par le moteur")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    p = uniform()
+    start = time.perf_counter()
+    values = action_values(p, args.opponents, args.rules)
+    elapsed = time.perf_counter() - start
+    print(f"{args.opponents} adversaires uniformes, règles {args.rules or 'aucune'} : table {values.shape} en {elapsed*1000:.1f} ms")
+    for m, row in zip(MULTIPLIERS, values):
+        best = int(row.argmin())
+        print(f"  x{m} : meilleure action {best:>3} (perte {row[best]:.3f}), pire {int(row.argmax()):>3} (perte {row.max():.3f})")
+    if args.check:
+        rng = new_rng(args.seed)
+        worst = 0
+        for m, row in zip(MULTIPLIERS, values):
+            worst = max(worst, np.abs(check(p, args.opponents, m, args.rules, args.check, rng) - row).max())
+        print(f"Écart max avec le moteur ({args.check} parties par action) : {worst:.3f}")
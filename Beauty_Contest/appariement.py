@@ -0,0 +1,107 @@
+# === appariement.py ===
+# File d'attente des parties rapides du serveur : chaque joueur demande une
+# taille de table (2 à 8 comme Local_Game, ou plus) et, en option, une
+# table de son niveau (d'après le classement). Dès que la file d'une
+# (taille, niveau) a assez de joueurs, la table est formée ; au bout de
+# MATCH_TIMEOUT secondes d'attente, le plus ancien part avec ceux qui
+# attendent avec lui et des sièges IA complètent la table.
+#
+# Une file FIFO par (taille, niveau), retraits paresseux : entrée, sortie
+# et formation en O(1) amorti ; échéances dans le tas de minuteurs partagé
+# du serveur (O(log n)). Les files sont propres à chaque worker.
+import itertools
+from collections import deque
+
+MIN_SIZE = 2
+MAX_SIZE = 50  # comme les sièges IA du serveur
+DEFAULT_SIZE = 4
+MATCH_TIMEOUT = 20  # secondes avant de compléter la table avec des IA
+SKILL_MIN_GAMES = 5  # en dessous : niveau débutant
+SKILL_BRACKETS = (0.15, 0.35)  # seuils de taux de victoire entre niveaux
+
+
+def skill_bracket(stats):
+    # Niveau d'un joueur d'après (parties, victoires) du classement, ou None :
+    # 0 débutant, puis 1.. selon le taux de victoire
+    if stats is None or stats[0] < SKILL_MIN_GAMES:
+        return 0
+    rate = stats[1] / stats[0]
+    return 1 + sum(rate >= t for t in SKILL_BRACKETS)
+
+
+def clamp_size(size):
+    return min(max(size, MIN_SIZE), MAX_SIZE) if isinstance(size, int) and not isinstance(size, bool) else DEFAULT_SIZE
+
+
+class Matchmaker:
+    # timers : add(échéance, callback) / cancel(entrée), comme serveur.RoundTimers ;
+    # clock : horloge de ces échéances ; on_match(tickets, n_ai) reçoit les
+    # joueurs d'une table formée ({'client','name','key','since',...})
+    def __init__(self, timers, clock, on_match, timeout=MATCH_TIMEOUT):
+        self.timers = timers
+        self.clock = clock
+        self.on_match = on_match
+        self.timeout = timeout
+        self.queues = {}  # (taille, niveau) -> deque de tickets, y compris des retirés
+        self.counts = {}  # (taille, niveau) -> joueurs encore en attente
+        self.waiting = {}  # client -> ticket
+        self.counter = itertools.count()
+
+    def join(self, client, name, size=DEFAULT_SIZE, bracket=None):
+        # Renvoie (clé de la file, joueurs en attente avant la formation éventuelle)
+        self.leave(client)
+        key = (clamp_size(size), bracket)
+        now = self.clock()
+        ticket = {'client':client,'name':name,'key':key,'since':now,'expiry':None,'n':next(self.counter)}
+        self.waiting[client] = ticket
+        self.queues.setdefault(key, deque()).append(ticket)
+        count = self.counts[key] = self.counts.get(key, 0) + 1
+        if count >= key[0]:
+            self.on_match(self._take(key, key[0]), 0)
+        else:
+            ticket['expiry'] = self.timers.add(now + self.timeout, lambda: self._expire(ticket))
+        return key, count
+
+    def leave(self, client):
+        ticket = self.waiting.pop(client, None)
+        if ticket is None:
+            return False
+        if ticket['expiry'] is not None:
+            self.timers.cancel(ticket['expiry'])
+        key = ticket['key']
+        self.counts[key] -= 1
+        queue = self.queues[key]
+        if not self.counts[key]:
+            del self.counts[key], self.queues[key]
+        elif len(queue) > 2 * self.counts[key] + 16:
+            # trop de tickets retirés en attente d'être sautés : on compacte
+            self.queues[key] = deque(t for t in queue if self.waiting.get(t['client']) is t)
+        return True
+
+    def _take(self, key, n):
+        # Les n plus anciens joueurs encore en attente de la file
+        queue = self.queues[key]
+        players = []
+        while queue and len(players) < n:
+            ticket = queue.popleft()
+            if self.waiting.get(ticket['client']) is not ticket:
+                continue
+            del self.waiting[ticket['client']]
+            if ticket['expiry'] is not None:
+                self.timers.cancel(ticket['expiry'])
+                ticket['expiry'] = None
+            players.append(ticket)
+        self.counts[key] -= len(players)
+        if not self.counts[key]:
+            del self.counts[key], self.queues[key]
+        return players
+
+    def _expire(self, ticket):
+        # Attente dépassée : même échéance pour tous, ce ticket est le plus
+        # ancien de sa file ; la table part avec des IA pour les places libres
+        ticket['expiry'] = None
+        if self.waiting.get(ticket['client']) is not ticket:
+            return
+        size = ticket['key'][0]
+        players = self._take(ticket['key'], size)
+        self.on_match(players, size - len(players))
@@ -0,0 +1,96 @@
+# === bench_demarrage.py ===
+# Mesure du temps de démarrage des points d'entrée avec `python -X importtime`.
+# Les imports sont lancés depuis un dossier vide : un module qui chargerait
+# le modèle RL à l'import échoue donc ici.
+#
+#   python bench_demarrage.py --budget IA_vs_Human=300 --json demarrage.json
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ENTRY_POINTS = ['IA_vs_Human', 'IA_Training', 'Local_Game', 'simulation', 'entrainement', 'serveur']
+
+
+def parse_importtime(stderr):
+    # Lignes "import time: self [us] | cumulative | nom", l'indentation du nom donne la profondeur
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure(module, cwd):
+    env = dict(os.environ, PYTHONPATH=HERE + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=cwd, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} a échoué:\n{proc.stderr.splitlines()[-1]}")
+    rows = parse_importtime(proc.stderr)
+    end = next(i for i, (name, depth, _, _) in enumerate(rows) if name == module and depth == 0)
+    first = end
+    while first > 0 and rows[first-1][1] > 0:
+        first -= 1
+    # dépendances directes du module (affichées avant lui), les plus coûteuses
+    children = [(name, cum) for name, depth, _, cum in rows[first:end] if depth == 1]
+    top = sorted(children, key=lambda r: -r[1])[:5]
+    total = rows[end][3]
+    return {'import_ms': total / 1000, 'wall_ms': wall * 1000, 'top': [(name, cum / 1000) for name, cum in top]}
+
+
+def run(modules, repeat):
+    results = {}
+    with tempfile.TemporaryDirectory() as cwd:
+        for module in modules:
+            try:
+                runs = [measure(module, cwd) for _ in range(repeat)]
+            except RuntimeError as e:
+                results[module] = {'error': str(e)}
+                continue
+            results[module] = {
+                'import_ms': statistics.median(r['import_ms'] for r in runs),
+                'wall_ms': statistics.median(r['wall_ms'] for r in runs),
+                'top': runs[-1]['top'],
+            }
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Temps d'import des points d'entrée")
+    parser.add_argument('modules', nargs='*', default=ENTRY_POINTS)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget', action='append', default=[], metavar='MODULE=MS',
+                        help="temps d'import maximal (médiane) ; échec si dépassé")
+    parser.add_argument('--json', help="fichier de sortie JSON")
+    args = parser.parse_args()
+
+    budgets = {m: float(ms) for m, ms in (b.split('=') for b in args.budget)}
+    results = run(args.modules, args.repeat)
+    failed = False
+    for module, r in results.items():
+        if 'error' in r:
+            failed = True
+            print(f"{module:<14} ERREUR {r['error']}")
+            continue
+        budget = budgets.get(module)
+        status = ''
+        if budget is not None:
+            status = 'OK' if r['import_ms'] <= budget else f'TROP LENT (budget {budget:.0f} ms)'
+            failed |= r['import_ms'] > budget
+        print(f"{module:<14} import {r['import_ms']:7.1f} ms | processus {r['wall_ms']:7.1f} ms {status}")
+        print("               " + ", ".join(f"{name} {ms:.1f}" for name, ms in r['top']))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if failed else 0)
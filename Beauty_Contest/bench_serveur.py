@@ -0,0 +1,243 @@
+# === bench_serveur.py ===
+# Test de charge du serveur WebSocket : des bots parlent le protocole de
+# serveur.py (join / start_game / answer) par salles de --room-size joueurs.
+# Mesures : latence de connexion (ouverture -> 'joined'), durée
+# round_start -> round_result vue par les bots, messages reçus par seconde
+# et mémoire (RSS) du serveur lancé en sous-processus.
+#
+#   python bench_serveur.py --players 10 100 1000 --json charge.json
+#   python bench_serveur.py --players 100 --policy   # réponses des IA
+#   python bench_serveur.py --players 1000 --format msgpack
+import argparse
+import asyncio
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import msgpack
+import websockets
+
+from moteur import encode_state, new_rng, rng_choice
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+START_RE = re.compile(r"(\d+) joueurs, (\d+) vies")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def rss_mb(pid):
+    # Mémoire résidente d'un processus (Linux), None si indisponible
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+
+
+def percentiles(values):
+    if not values:
+        return None
+    values = sorted(values)
+    pick = lambda q: values[min(len(values)-1, int(q*len(values)))]
+    return {'n': len(values), 'mean': statistics.fmean(values), 'p50': pick(0.5), 'p95': pick(0.95), 'p99': pick(0.99), 'max': values[-1]}
+
+
+class Bot:
+    # Un client : répond au hasard ou avec la politique d'une IA
+    def __init__(self, name, stats, policy=None, rng=None, fmt='json'):
+        self.name = name
+        self.format = fmt
+        self.stats = stats
+        self.policy = policy
+        self.rng = rng
+        self.lives = {}
+        self.names = []  # noms par siège (format compact)
+        self.start = None  # (joueurs, vies initiales) annoncés au lancement
+        self.rounds = 0
+
+    def answer(self, m):
+        banned = set(m['forbidden'])
+        if self.policy is None:
+            allowed = [v for v in range(101) if v not in banned]
+            return rng_choice(self.rng, allowed)
+        if self.lives:
+            own = self.lives.get(self.name, 0)
+            others = [l for name, l in self.lives.items() if name != self.name and l > 0]
+        else:
+            n_players, own = self.start or (1, 0)
+            others = [own] * (n_players - 1)
+        state = encode_state(own, m['multiplier'], m['round'], others)
+        return self.policy.choose_action(state, banned, rng=self.rng)
+
+    def encode(self, message):
+        return msgpack.packb(message) if self.format == 'msgpack' else json.dumps(message)
+
+    async def run(self, url, room, max_rounds, start=None, joined=None):
+        t0 = time.perf_counter()
+        async with websockets.connect(url, max_queue=None) as ws:
+            # le join est toujours en JSON : c'est lui qui négocie le format
+            await ws.send(json.dumps({'type':'join','name':self.name,'room':room,'format':self.format}))
+            round_start = None
+            async for raw in ws:
+                self.stats['messages'] += 1
+                self.stats['bytes'] += len(raw)
+                m = msgpack.unpackb(raw) if isinstance(raw, bytes) else json.loads(raw)
+                t = m.get('type')
+                if t == 'joined':
+                    self.stats['connect'].append((time.perf_counter() - t0) * 1000)
+                    if joined is not None:
+                        joined.set_result(m['room'])
+                    if start is not None:
+                        await start
+                        await ws.send(self.encode({'type':'start_game'}))
+                elif t == 'info':
+                    found = START_RE.search(m['text'])
+                    if found:
+                        self.start = (int(found.group(1)), int(found.group(2)))
+                    if 'gagnant' in m['text']:
+                        break
+                elif t == 'players':
+                    self.names = m['names']
+                    self.lives = dict(zip(m['names'], m['lives']))
+                elif t == 'round_start':
+                    round_start = time.perf_counter()
+                    if self.lives.get(self.name, 1) > 0:
+                        await ws.send(self.encode({'type':'answer','value':self.answer(m)}))
+                elif t == 'round_result':
+                    if round_start is not None:
+                        self.stats['round'].append((time.perf_counter() - round_start) * 1000)
+                    if self.format == 'json':
+                        self.lives = {p['name']: p['lives'] for p in m['lives']}
+                    else:
+                        self.lives.update((self.names[seat], lives) for seat, lives in m['lives'])
+                    self.rounds += 1
+                    if self.rounds >= max_rounds or self.lives.get(self.name, 0) <= 0:
+                        break
+
+
+async def run_room(url, room_size, max_rounds, stats, policies, rng, fmt):
+    # Le premier bot crée la salle et lance la partie quand tous ont rejoint
+    ai = list(policies.values()) if policies else [None]
+    bots = [Bot(f"bot{i}", stats, ai[i % len(ai)], new_rng(rng.integers(2**63)), fmt) for i in range(room_size)]
+    loop = asyncio.get_running_loop()
+    joined = [loop.create_future() for _ in bots]
+    host = asyncio.create_task(bots[0].run(url, None, max_rounds, asyncio.gather(*joined[1:]), joined[0]))
+    code = await joined[0]
+    others = [asyncio.create_task(b.run(url, code, max_rounds, joined=f)) for b, f in zip(bots[1:], joined[1:])]
+    results = await asyncio.gather(host, *others, return_exceptions=True)
+    stats['errors'] += sum(isinstance(r, Exception) for r in results)
+
+
+async def load(url, n_players, room_size, max_rounds, policies, seed, pid, fmt='json'):
+    rng = new_rng(seed)
+    stats = {'messages': 0, 'bytes': 0, 'connect': [], 'round': [], 'errors': 0}
+    sizes = [room_size] * (n_players // room_size)
+    if n_players % room_size:
+        sizes.append(n_players % room_size)
+
+    rss_peak = rss_mb(pid) if pid else None
+    rss_start = rss_peak
+
+    start = time.perf_counter()
+    tasks = []
+    for size in sizes:
+        tasks.append(asyncio.create_task(run_room(url, size, max_rounds, stats, policies, rng, fmt)))
+    pending = set(tasks)
+    while pending:
+        done, pending = await asyncio.wait(pending, timeout=0.5)
+        if pid:
+            rss = rss_mb(pid)
+            if rss is not None:
+                rss_peak = max(rss_peak or 0, rss)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'players': n_players,
+        'rooms': len(sizes),
+        'duration_s': elapsed,
+        'messages': stats['messages'],
+        'messages_per_s': stats['messages'] / elapsed,
+        'bytes': stats['bytes'],
+        'bytes_per_message': stats['bytes'] / max(stats['messages'], 1),
+        'connect_ms': percentiles(stats['connect']),
+        'round_ms': percentiles(stats['round']),
+        'server_rss_mb': {'start': rss_start, 'peak': rss_peak},
+        'errors': stats['errors'],
+    }
+
+
+def start_server(port):
+    # sans journal ni classement : pas de fichiers écrits, pas d'E/S disque dans les mesures
+    env = {**os.environ, 'LMS_JOURNAL': '', 'LMS_CLASSEMENT': ''}
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "serveur:app", "--host", "127.0.0.1",
+                             "--port", str(port), "--log-level", "warning"], cwd=HERE, env=env)
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("le serveur s'est arrêté au démarrage")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("le serveur ne répond pas")
+
+
+def run(player_counts, room_size=10, max_rounds=5, url=None, policy=False, model=None, seed=None, fmt='json'):
+    policies = None
+    if policy:
+        from politique import get_policies
+        policies = get_policies(model)
+    results = []
+    for n_players in player_counts:
+        # un serveur neuf par palier, pour que la RSS ne cumule pas les paliers
+        proc = None
+        if url is None:
+            port = free_port()
+            proc = start_server(port)
+        try:
+            results.append(asyncio.run(load(url or f"ws://127.0.0.1:{port}/ws", n_players, room_size,
+                                            max_rounds, policies, seed, proc and proc.pid, fmt)))
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait(timeout=10)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Test de charge du serveur WebSocket")
+    parser.add_argument('--players', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--room-size', type=int, default=10)
+    parser.add_argument('--rounds', type=int, default=5, help="manches jouées par chaque bot au plus")
+    parser.add_argument('--url', default=None, help="serveur déjà lancé (ws://hôte:port/ws), RSS non mesurée")
+    parser.add_argument('--policy', action='store_true', help="réponses choisies par les IA du modèle")
+    parser.add_argument('--model', default=None, help="modèle RL ou politique exportée")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--format', choices=['json', 'msgpack'], default='json', help="protocole négocié par les bots")
+    parser.add_argument('--json', help="fichier de sortie JSON")
+    args = parser.parse_args()
+
+    results = run(args.players, args.room_size, args.rounds, args.url, args.policy, args.model, args.seed, args.format)
+    for r in results:
+        c, m = r['connect_ms'] or {}, r['round_ms'] or {}
+        rss = r['server_rss_mb']['peak']
+        print(f"{r['players']:>5} joueurs ({r['rooms']} salles) | connexion p50 {c.get('p50', 0):.1f} ms p99 {c.get('p99', 0):.1f} ms"
+              f" | manche p50 {m.get('p50', 0):.1f} ms p99 {m.get('p99', 0):.1f} ms | {r['messages_per_s']:.0f} msg/s"
+              f" ({r['bytes_per_message']:.0f} o/msg)"
+              f" | RSS {'-' if rss is None else f'{rss:.0f} Mo'} | erreurs {r['errors']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({'version': 1, 'room_size': args.room_size, 'rounds': args.rounds, 'format': args.format, 'results': results}, f, indent=2)
@@ -0,0 +1,262 @@
+# === bus.py ===
+# Bus de messages entre les workers de serveur.py.
+# Chaque worker est abonné à son canal ("worker:<id>"). La propriété des
+# salles est un registre partagé : la première réclamation d'un code gagne,
+# et la boucle de jeu de la salle ne tourne que sur ce worker ; les autres
+# lui relaient les messages de leurs clients.
+#
+#   LocalBus       un seul processus (défaut)
+#   UnixSocketBus  plusieurs workers sur une machine : python bus.py --socket /tmp/lms.sock
+#   RedisBus       adaptateur Redis (PUBLISH/SUBSCRIBE, SET NX), si redis est installé
+#
+# Les messages passent en msgpack : les trames des clients peuvent être binaires.
+import argparse
+import asyncio
+import itertools
+import os
+import struct
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+_FRAME = struct.Struct(">I")
+
+
+def worker_channel(worker_id):
+    return f"worker:{worker_id}"
+
+
+def make_bus(spec=None, worker_id=None):
+    # "local" (défaut), "unix:/chemin/du/socket" ou "redis://hôte:port/0"
+    if not spec or spec == 'local':
+        return LocalBus(worker_id)
+    if spec.startswith('unix:'):
+        return UnixSocketBus(spec[len('unix:'):], worker_id)
+    if spec.startswith(('redis://', 'rediss://', 'unix+redis://')):
+        return RedisBus(spec.replace('unix+redis://', 'unix://', 1), worker_id)
+    raise ValueError(f"bus inconnu : {spec}")
+
+
+class MessageBus:
+    # Interface commune ; publish et release ne bloquent pas
+    def __init__(self, worker_id=None):
+        self.worker_id = worker_id or str(os.getpid())
+        self.handler = None
+
+    async def start(self, handler):
+        # handler(msg) reçoit les messages publiés sur le canal de ce worker
+        self.handler = handler
+
+    def publish(self, channel, msg):
+        raise NotImplementedError
+
+    async def claim(self, room):
+        # id du worker propriétaire de la salle (ce worker si elle était libre)
+        raise NotImplementedError
+
+    def release(self, room):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class LocalBus(MessageBus):
+    # Un seul worker : toutes les salles sont locales
+    def __init__(self, worker_id=None):
+        super().__init__(worker_id)
+        self.owners = {}
+
+    def publish(self, channel, msg):
+        if channel == worker_channel(self.worker_id) and self.handler is not None:
+            asyncio.get_running_loop().call_soon(self.handler, msg)
+
+    async def claim(self, room):
+        return self.owners.setdefault(room, self.worker_id)
+
+    def release(self, room):
+        if self.owners.get(room) == self.worker_id:
+            del self.owners[room]
+
+
+# =====================
+# Unix socket
+# =====================
+def _require_msgpack():
+    if msgpack is None:
+        raise RuntimeError("msgpack est nécessaire pour le bus entre workers")
+
+
+async def read_frame(reader):
+    size, = _FRAME.unpack(await reader.readexactly(_FRAME.size))
+    return msgpack.unpackb(await reader.readexactly(size))
+
+
+def write_frame(writer, msg):
+    data = msgpack.packb(msg)
+    writer.write(_FRAME.pack(len(data)) + data)
+
+
+class Broker:
+    # Relais des workers d'une machine : abonnements et registre des salles
+    def __init__(self):
+        self.subscribers = {}  # canal -> writers abonnés
+        self.owners = {}  # salle -> (worker, writer)
+
+    async def handle(self, reader, writer):
+        channels = set()
+        try:
+            while True:
+                msg = await read_frame(reader)
+                op = msg['op']
+                if op == 'sub':
+                    self.subscribers.setdefault(msg['channel'], set()).add(writer)
+                    channels.add(msg['channel'])
+                elif op == 'pub':
+                    for w in self.subscribers.get(msg['channel'], ()):
+                        write_frame(w, msg)
+                elif op == 'claim':
+                    owner = self.owners.setdefault(msg['room'], (msg['worker'], writer))[0]
+                    write_frame(writer, {'op':'reply','id':msg['id'],'owner':owner})
+                elif op == 'release':
+                    if self.owners.get(msg['room'], (None,))[0] == msg['worker']:
+                        del self.owners[msg['room']]
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for channel in channels:
+                self.subscribers[channel].discard(writer)
+            # worker arrêté : ses salles sont libérées
+            for room, (_, w) in list(self.owners.items()):
+                if w is writer:
+                    del self.owners[room]
+            writer.close()
+
+
+async def serve_broker(path):
+    _require_msgpack()
+    if os.path.exists(path):
+        os.unlink(path)
+    server = await asyncio.start_unix_server(Broker().handle, path)
+    async with server:
+        await server.serve_forever()
+
+
+class UnixSocketBus(MessageBus):
+    def __init__(self, path, worker_id=None):
+        _require_msgpack()
+        super().__init__(worker_id)
+        self.path = path
+        self.pending = {}  # n° de requête -> future de la réponse
+        self.ids = itertools.count()
+        self.task = None
+
+    async def start(self, handler):
+        await super().start(handler)
+        self.reader, self.writer = await asyncio.open_unix_connection(self.path)
+        write_frame(self.writer, {'op':'sub','channel':worker_channel(self.worker_id)})
+        self.task = asyncio.create_task(self._read())
+
+    async def _read(self):
+        try:
+            while True:
+                msg = await read_frame(self.reader)
+                if msg['op'] == 'reply':
+                    future = self.pending.pop(msg['id'], None)
+                    if future is not None and not future.done():
+                        future.set_result(msg['owner'])
+                else:
+                    self.handler(msg['msg'])
+        except (asyncio.IncompleteReadError, ConnectionError):
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("bus fermé"))
+
+    def publish(self, channel, msg):
+        write_frame(self.writer, {'op':'pub','channel':channel,'msg':msg})
+
+    async def claim(self, room):
+        request_id = next(self.ids)
+        future = self.pending[request_id] = asyncio.get_running_loop().create_future()
+        write_frame(self.writer, {'op':'claim','room':room,'worker':self.worker_id,'id':request_id})
+        return await future
+
+    def release(self, room):
+        write_frame(self.writer, {'op':'release','room':room,'worker':self.worker_id})
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.writer.close()
+
+
+# =====================
+# Redis
+# =====================
+_RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+
+class RedisBus(MessageBus):
+    # Même contrat sur Redis : un canal PUBLISH par worker, une clé SET NX
+    # par salle. Les envois passent par une file pour garder publish synchrone.
+    def __init__(self, url, worker_id=None, prefix='lms:'):
+        _require_msgpack()
+        if aioredis is None:
+            raise RuntimeError("le paquet redis est nécessaire pour RedisBus")
+        super().__init__(worker_id)
+        self.url = url
+        self.prefix = prefix
+        self.queue = asyncio.Queue()
+        self.tasks = []
+
+    async def start(self, handler):
+        await super().start(handler)
+        self.redis = aioredis.from_url(self.url)
+        self.pubsub = self.redis.pubsub()
+        await self.pubsub.subscribe(self.prefix + worker_channel(self.worker_id))
+        self.tasks = [asyncio.create_task(self._read()), asyncio.create_task(self._write())]
+
+    async def _read(self):
+        async for m in self.pubsub.listen():
+            if m['type'] == 'message':
+                self.handler(msgpack.unpackb(m['data']))
+
+    async def _write(self):
+        while True:
+            op = await self.queue.get()
+            await op()
+
+    def publish(self, channel, msg):
+        data = msgpack.packb(msg)
+        self.queue.put_nowait(lambda: self.redis.publish(self.prefix + channel, data))
+
+    async def claim(self, room):
+        key = self.prefix + 'room:' + room
+        await self.redis.set(key, self.worker_id, nx=True)
+        return (await self.redis.get(key)).decode()
+
+    def release(self, room):
+        # supprimée seulement si ce worker en est encore propriétaire
+        key = self.prefix + 'room:' + room
+        self.queue.put_nowait(lambda: self.redis.eval(_RELEASE_SCRIPT, 1, key, self.worker_id))
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        if self.tasks:
+            await self.pubsub.aclose()
+            await self.redis.aclose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Relais Unix socket entre les workers de serveur.py")
+    parser.add_argument('--socket', default='/tmp/lms_bus.sock')
+    args = parser.parse_args()
+    asyncio.run(serve_broker(args.socket))
@@ -0,0 +1,195 @@
+# === classement.py ===
+# Classement et historique des parties dans une base SQLite locale.
+# Les résultats arrivent en fin de partie (journal.GameRecord.end) et sont
+# écrits par un thread dédié, par lots dans une seule transaction : add()
+# ne fait que déposer le résultat dans une file, la partie ne bloque jamais.
+#
+#   games    une ligne par partie (source, graine, manches, gagnant)
+#   results  une ligne par siège : victoire, manches survécues, rang
+#            d'élimination (1 = premier éliminé), agent pour les sièges IA
+#   players  cumul par joueur (parties, victoires, manches), mis à jour
+#            dans la même transaction ; index pour le top N. Clé (nom,
+#            agent), agent '' pour un humain : un humain qui prend le nom
+#            d'une IA n'est pas compté avec elle
+#
+# Désactivé par défaut pour les parties : LMS_CLASSEMENT=base ou
+# --classement [base] l'active. La lecture ci-dessous lit classement.db
+# si rien n'est indiqué.
+#
+#   python classement.py                  # top 20
+#   python classement.py --player IA_3    # dernières parties d'un joueur
+import argparse
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+CLASSEMENT_PATH = "classement.db"
+BATCH_SIZE = 500  # parties écrites au plus par transaction
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    journal_id TEXT,
+    source TEXT NOT NULL,
+    seed INTEGER,
+    players INTEGER NOT NULL,
+    rounds INTEGER NOT NULL,
+    winner TEXT,
+    ended REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    game INTEGER NOT NULL REFERENCES games(id),
+    seat INTEGER NOT NULL,
+    player TEXT NOT NULL,
+    agent TEXT,
+    won INTEGER NOT NULL,
+    rounds_survived INTEGER NOT NULL,
+    elimination INTEGER,
+    left_game INTEGER NOT NULL,
+    PRIMARY KEY (game, seat)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_player ON results(player, game DESC);
+CREATE TABLE IF NOT EXISTS players (
+    name TEXT NOT NULL,
+    agent TEXT NOT NULL,
+    games INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    rounds INTEGER NOT NULL,
+    PRIMARY KEY (name, agent)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS players_top ON players(wins DESC, rounds DESC);
+"""
+
+SCHEMA_VERSION = 1  # 1 : players indexé par (nom, agent)
+
+_UPSERT_PLAYER = """
+INSERT INTO players(name, agent, games, wins, rounds) VALUES (?, ?, 1, ?, ?)
+ON CONFLICT(name, agent) DO UPDATE SET games = games + 1, wins = wins + excluded.wins,
+    rounds = rounds + excluded.rounds
+"""
+
+# Ancienne base (players indexé par le seul nom) : les cumuls sont refaits
+# depuis results, qui garde l'agent de chaque siège
+_REBUILD_PLAYERS = """
+INSERT INTO players SELECT player, coalesce(agent, ''), count(*), sum(won), sum(rounds_survived)
+    FROM results GROUP BY player, coalesce(agent, '');
+"""
+
+
+def classement_path(path=None):
+    # LMS_CLASSEMENT choisit la base ; absent ou vide = pas de classement
+    return os.environ.get('LMS_CLASSEMENT', '') if path is None else path
+
+
+def create(db):
+    old = db.execute("SELECT 1 FROM sqlite_master WHERE name = 'players'").fetchone()
+    if old and db.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+        db.executescript("BEGIN; DROP TABLE players;" + SCHEMA + _REBUILD_PLAYERS + "COMMIT;")
+    else:
+        db.executescript(SCHEMA)
+    db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def connect(path):
+    db = sqlite3.connect(path, timeout=10)
+    db.execute("PRAGMA journal_mode=WAL")  # lectures sans bloquer l'écrivain
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
+
+
+class Leaderboard:
+    # Base ouverte en écriture par un thread ; path vide = classement désactivé
+    def __init__(self, path=None):
+        self.path = classement_path(path)
+        self.queue = queue.SimpleQueue()
+        self.thread = None
+        if not self.path:
+            return
+        with closing(connect(self.path)) as db:
+            create(db)
+        self.thread = threading.Thread(target=self._write, name="classement", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def add(self, game, rows):
+        # game : (journal_id, source, graine, manches, gagnant) ;
+        # rows : (siège, joueur, agent, gagné, manches survécues, rang d'élimination, parti)
+        if self.thread is not None:
+            self.queue.put((game + (time.time(),), rows))
+
+    def _write(self):
+        db = connect(self.path)
+        done = False
+        while not done:
+            # attend un résultat, puis prend tous ceux déjà en file (None = arrêt)
+            batch = []
+            item = self.queue.get()
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= BATCH_SIZE:
+                    break
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            done = item is None
+            with db:
+                for game, rows in batch:
+                    journal_id, source, seed, rounds, winner, ended = game
+                    game_id = db.execute("INSERT INTO games(journal_id, source, seed, players, rounds, winner, ended) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                         (journal_id, source, seed, len(rows), rounds, winner, ended)).lastrowid
+                    db.executemany("INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [(game_id,) + row for row in rows])
+                    db.executemany(_UPSERT_PLAYER, [(player, agent or '', won, survived) for _, player, agent, won, survived, _, _ in rows])
+        db.close()
+
+    def close(self):
+        # vide la file puis arrête le thread
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+
+# =====================
+# Lecture
+# =====================
+def top(path=None, n=20):
+    # agent None pour un humain
+    with closing(connect(classement_path(path))) as db:
+        return db.execute("SELECT name, nullif(agent, ''), games, wins, rounds FROM players ORDER BY wins DESC, rounds DESC LIMIT ?", (n,)).fetchall()
+
+
+def player_stats(player, path=None, agent=None):
+    # (parties, victoires) d'un joueur humain (ou de l'agent indiqué), None
+    # s'il n'a jamais joué
+    with closing(connect(classement_path(path))) as db:
+        return db.execute("SELECT games, wins FROM players WHERE name = ? AND agent = ?", (player, agent or '')).fetchone()
+
+
+def history(player, path=None, n=20):
+    # Dernières parties sous ce nom, la plus récente d'abord ; agent None
+    # pour un siège humain
+    with closing(connect(classement_path(path))) as db:
+        return db.execute("""SELECT g.id, g.source, g.ended, g.rounds, g.players, r.won, r.rounds_survived, r.elimination, r.left_game, r.agent
+                             FROM results r JOIN games g ON g.id = r.game
+                             WHERE r.player = ? ORDER BY r.game DESC LIMIT ?""", (player, n)).fetchall()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Classement des joueurs")
+    parser.add_argument('path', nargs='?', default=classement_path() or CLASSEMENT_PATH)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--player', help="historique d'un joueur")
+    args = parser.parse_args()
+
+    if args.player:
+        for game_id, source, ended, rounds, players, won, survived, elimination, left, agent in history(args.player, args.path, args.top):
+            outcome = "victoire" if won else "parti" if left else f"éliminé {elimination}{'er' if elimination == 1 else 'e'}" if elimination else "survivant"
+            print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(ended))}  partie {game_id} ({source}, {players} joueurs){f' [{agent}]' if agent else ''} : {outcome}, {survived}/{rounds} manches")
+    else:
+        for rank, (name, agent, games, wins, rounds) in enumerate(top(args.path, args.top), 1):
+            print(f"{rank:>3}. {name}{f' [{agent}]' if agent and agent != name else ''} : {wins} victoires / {games} parties, {rounds} manches")
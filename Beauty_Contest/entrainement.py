@@ -0,0 +1,232 @@
+# === entrainement.py ===
+# Entraînement des IA par Q-learning en self-play.
+# Des processus "workers" jouent des épisodes avec leur copie des Q-tables
+# et renvoient leurs mises à jour (deltas) au "learner", qui les fusionne,
+# renvoie la fusion à tous les workers et sauvegarde régulièrement le
+# history_list chargé par IA_Training et IA_vs_Human.
+#
+#   python entrainement.py --iterations 200 --episodes 500
+import argparse
+import multiprocessing as mp
+import os
+import time
+
+import numpy as np
+
+from modele import MODEL_PATH, load_history, save_history
+from moteur import N_ACTIONS, NO_CHOICE, GameState, RuleSet, choose_action, draw_multiplier, new_rng
+
+MAX_ROUNDS = 50
+INITIAL_LIVES = 10
+WIN_REWARD = 10
+
+
+class LocalTables:
+    # Copie locale des Q-tables d'un worker, qui garde les valeurs de départ
+    # des états modifiés pour en extraire les deltas
+    def __init__(self, tables):
+        self.tables = tables
+        self.base = {}
+
+    def row(self, name, state):
+        q_table = self.tables[name]
+        row = q_table.get(state)
+        key = (name, state)
+        if key not in self.base:
+            self.base[key] = None if row is None else row.copy()
+        if row is None:
+            row = q_table[state] = np.zeros(N_ACTIONS)
+        return row
+
+    def take_delta(self):
+        # Renvoie les deltas et remet les valeurs de départ : la version
+        # fusionnée arrive ensuite par apply_delta
+        delta = {}
+        for (name, state), base in self.base.items():
+            row = self.tables[name][state]
+            delta[(name, state)] = row - (0 if base is None else base)
+            if base is None:
+                del self.tables[name][state]
+            else:
+                row[:] = base
+        self.base = {}
+        return delta
+
+    def apply_delta(self, delta):
+        apply_delta(self.tables, delta)
+
+
+def apply_delta(tables, delta):
+    for (name, state), d in delta.items():
+        row = tables[name].get(state)
+        if row is None:
+            tables[name][state] = d.copy()
+        else:
+            row += d
+
+
+def merge_deltas(deltas):
+    # Moyenne, état par état, des deltas des workers qui ont visité l'état
+    total = {}
+    count = {}
+    for delta in deltas:
+        for key, d in delta.items():
+            if key in total:
+                total[key] = total[key] + d
+                count[key] += 1
+            else:
+                total[key] = d
+                count[key] = 1
+    return {key: d / count[key] for key, d in total.items()}
+
+
+def play_episode(local, names, rng, epsilon, alpha, gamma):
+    # Une partie en self-play avec mise à jour Q-learning au fil des manches
+    game = GameState(names, INITIAL_LIVES)
+    multiplier = draw_multiplier(rng)
+    active_rules = RuleSet()
+    pending = {}  # siège -> (état, action, vies avant la manche)
+
+    def update(seat, target):
+        state, action, _ = pending.pop(seat)
+        row = local.row(names[seat], state)
+        row[action] += alpha * (target - row[action])
+
+    round_number = 0
+    for round_number in range(1, MAX_ROUNDS+1):
+        alive = game.alive_indices().tolist()
+        if len(alive) <= 1:
+            break
+
+        # Manche 5 : forcer une règle si aucune active
+        if round_number == 5 and not active_rules and len(alive) > 2:
+            game.activate_rule(active_rules, rng)
+        setup = active_rules.pre_round(multiplier, rng=rng)
+        multiplier, banned = setup.multiplier, setup.banned
+
+        lives = game.lives.tolist()
+        choices = [NO_CHOICE]*len(names)
+        for i in alive:
+            state = game.encode(i, multiplier, round_number)
+            q_table = local.tables[names[i]]
+            if i in pending:
+                _, _, before = pending[i]
+                next_q = q_table.get(state)
+                update(i, lives[i] - before + gamma * (0 if next_q is None else max(next_q)))
+            choices[i] = choose_action(q_table, state, banned, epsilon, rng)
+            pending[i] = (state, choices[i]//5, lives[i])
+
+        game.resolve(choices, multiplier, active_rules)
+        for _ in game.newly_eliminated():
+            if game.alive_count() > 2:
+                game.activate_rule(active_rules, rng)
+
+        # Éliminés : fin de l'épisode pour eux
+        for i in alive:
+            if game.lives[i] <= 0:
+                update(i, int(game.lives[i]) - pending[i][2])
+
+    # Fin de partie : le dernier survivant reçoit le bonus de victoire
+    survivors = game.alive_indices().tolist()
+    for i in list(pending):
+        bonus = WIN_REWARD if len(survivors) == 1 and i in survivors else 0
+        update(i, int(game.lives[i]) - pending[i][2] + bonus)
+    return (survivors[0] if len(survivors) == 1 else -1), round_number
+
+
+def _worker(worker_id, tables, names, alpha, gamma, seed, task_queue, result_queue):
+    # un flux NumPy indépendant par worker, reproductible avec --seed
+    rng = new_rng(None if seed is None else [seed, worker_id])
+    local = LocalTables(tables)
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        merged, episodes, epsilon = task
+        local.apply_delta(merged)
+        wins = [0]*len(names)
+        rounds = 0
+        for _ in range(episodes):
+            winner, length = play_episode(local, names, rng, epsilon, alpha, gamma)
+            if winner >= 0:
+                wins[winner] += 1
+            rounds += length
+        result_queue.put((local.take_delta(), wins, rounds))
+
+
+def snapshot(tables):
+    return {name: {state: row.copy() for state, row in q_table.items()} for name, q_table in tables.items()}
+
+
+def train(model_path=MODEL_PATH, n_agents=5, iterations=100, episodes=200, workers=None,
+          alpha=0.1, gamma=0.9, epsilon_start=0.3, epsilon_end=0.02, checkpoint_every=10, seed=None):
+    workers = workers or os.cpu_count() or 1
+    history_list = load_history(model_path) if os.path.exists(model_path) else []
+    if history_list:
+        # Reprise à partir du dernier snapshot
+        tables = {name: {state: np.array(q_vals, dtype=np.float64) for state, q_vals in q_table.items()}
+                  for name, q_table in history_list[-1].items()}
+    else:
+        tables = {f"IA_{i}": {} for i in range(1, n_agents+1)}
+    names = list(tables.keys())
+
+    ctx = mp.get_context()
+    result_queue = ctx.Queue()
+    task_queues = []
+    processes = []
+    for worker_id in range(workers):
+        task_queue = ctx.Queue()
+        proc = ctx.Process(target=_worker, args=(worker_id, tables, names, alpha, gamma, seed, task_queue, result_queue), daemon=True)
+        proc.start()
+        task_queues.append(task_queue)
+        processes.append(proc)
+
+    merged = {}
+    try:
+        for it in range(1, iterations+1):
+            epsilon = epsilon_start + (epsilon_end - epsilon_start) * (it-1) / max(iterations-1, 1)
+            start = time.perf_counter()
+            for task_queue in task_queues:
+                task_queue.put((merged, episodes, epsilon))
+            results = [result_queue.get() for _ in task_queues]
+            merged = merge_deltas(delta for delta, _, _ in results)
+            apply_delta(tables, merged)
+
+            elapsed = time.perf_counter() - start
+            n_episodes = episodes * workers
+            wins = np.sum([w for _, w, _ in results], axis=0)
+            rounds = sum(r for _, _, r in results)
+            n_states = sum(len(q_table) for q_table in tables.values())
+            best = names[int(np.argmax(wins))]
+            print(f"Itération {it}/{iterations} | epsilon {epsilon:.3f} | {n_episodes/elapsed:.0f} épisodes/s | "
+                  f"durée moy. {rounds/n_episodes:.1f} manches | états {n_states} | meilleur {best}")
+
+            if it % checkpoint_every == 0 or it == iterations:
+                history_list.append(snapshot(tables))
+                save_history(history_list, model_path)
+                print(f"Checkpoint {len(history_list)} -> {model_path}")
+    finally:
+        for task_queue in task_queues:
+            task_queue.put(None)
+        for proc in processes:
+            proc.join(timeout=5)
+    return tables
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Entraînement Q-learning des IA en self-play")
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--agents', type=int, default=5, help="nombre d'IA si le modèle n'existe pas")
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--episodes', type=int, default=200, help="épisodes par worker et par itération")
+    parser.add_argument('--workers', type=int, default=None, help="par défaut : tous les coeurs")
+    parser.add_argument('--alpha', type=float, default=0.1)
+    parser.add_argument('--gamma', type=float, default=0.9)
+    parser.add_argument('--epsilon-start', type=float, default=0.3)
+    parser.add_argument('--epsilon-end', type=float, default=0.02)
+    parser.add_argument('--checkpoint-every', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    train(args.model, args.agents, args.iterations, args.episodes, args.workers, args.alpha, args.gamma,
+          args.epsilon_start, args.epsilon_end, args.checkpoint_every, args.seed)
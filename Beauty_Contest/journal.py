@@ -0,0 +1,256 @@
+# === journal.py ===
+# Journal binaire des parties, en ajout seul, écrit par serveur, Local_Game,
+# IA_vs_Human et IA_Training ; relu ici pour rejouer ou recompter les parties.
+#
+# Fichier : en-tête "LMSJ" + version, puis des enregistrements
+#   type (u8) | taille du corps (u32) | id de partie (u64) | corps
+#   GAME   graine (i64, -1 inconnue), source (u8), vies initiales (u16), joueurs (u16), noms séparés par \0
+#   RULE   manche (u16), règle (u8) ; effet immédiat rejoué par on_activate (règle 5)
+#   ROUND  manche (u16), multiplicateur x10 (u8), masque des règles actives (u8),
+#          nombres interdits (101 bits), choix (i8 x N, -1 = aucun), vies après la manche (i16 x N)
+#   LEAVE  manche (u16), siège (u16) ; joueur parti (serveur)
+#   END    manches (u16), siège du gagnant (i16, -1 = aucun)
+# Chaque enregistrement part en un seul write en O_APPEND : plusieurs
+# processus peuvent écrire dans le même journal.
+# Désactivé par défaut : LMS_JOURNAL=fichier ou --journal [fichier] l'active.
+# Avec un classement (GameLog(results=Leaderboard())), chaque partie y envoie
+# son résultat à la fin : vainqueur, manches survécues, ordre d'élimination.
+#
+#   python journal.py parties.journal            # recompte toutes les manches
+#   python journal.py parties.journal --show ID  # déroulé d'une partie
+import argparse
+import os
+import random
+import struct
+import time
+
+import numpy as np
+
+from moteur import ALL_RULES, NO_CHOICE, RULES, resolve_round, rules_mask
+
+JOURNAL_PATH = "parties.journal"
+SOURCES = ['serveur', 'local', 'ia_vs_humain', 'console']
+
+MAGIC = b"LMSJ"
+VERSION = 1
+_FILE_HEADER = struct.Struct("<4sH")
+_RECORD = struct.Struct("<BIQ")
+GAME, RULE, ROUND, LEAVE, END = 1, 2, 3, 4, 5
+_GAME = struct.Struct("<qBHH")
+_RULE = struct.Struct("<HB")
+_ROUND = struct.Struct("<HBB13s")
+_LEAVE = struct.Struct("<HH")
+_END = struct.Struct("<Hh")
+
+
+def journal_path(path=None):
+    # LMS_JOURNAL choisit le fichier ; absent ou vide = pas de journal
+    return os.environ.get('LMS_JOURNAL', '') if path is None else path
+
+
+class GameLog:
+    # Journal ouvert en ajout ; path vide = journal désactivé.
+    # results : classement.Leaderboard qui reçoit les résultats des parties
+    def __init__(self, path=None, results=None):
+        self.path = journal_path(path)
+        self.results = results
+        self.fd = None
+        if not self.path:
+            return
+        try:
+            self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_EXCL, 0o644)
+            os.write(self.fd, _FILE_HEADER.pack(MAGIC, VERSION))
+        except FileExistsError:
+            self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+
+    def write(self, kind, game_id, body):
+        if self.fd is not None:
+            os.write(self.fd, _RECORD.pack(kind, len(body), game_id) + body)
+
+    def game(self, source, names, lives, seed=None, agents=None):
+        return GameRecord(self, source, names, lives, seed, agents)
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        if self.results is not None:
+            self.results.close()
+
+
+class GameRecord:
+    # Événements d'une partie ; agents : nom de l'agent de chaque siège IA (None = humain)
+    def __init__(self, log, source, names, lives, seed=None, agents=None):
+        self.log = log
+        self.id = random.getrandbits(64)
+        self.source = source
+        self.names = list(names)
+        self.seed = seed
+        self.agents = agents or [None] * len(self.names)
+        self.out_round = np.zeros(len(self.names), dtype=np.int64)  # manche d'élimination ou de départ, 0 = en jeu
+        self.left = np.zeros(len(self.names), dtype=bool)
+        names = '\0'.join(self.names).encode()
+        log.write(GAME, self.id, _GAME.pack(-1 if seed is None else seed, SOURCES.index(source), lives, len(self.names)) + names)
+
+    def rule(self, round_number, rule):
+        self.log.write(RULE, self.id, _RULE.pack(round_number, rule))
+
+    def round(self, round_number, multiplier, active_rules, banned, choices, lives):
+        banned_bits = np.zeros(101, dtype=bool)
+        banned_bits[list(banned)] = True
+        body = _ROUND.pack(round_number, round(multiplier*10), rules_mask(active_rules), np.packbits(banned_bits).tobytes())
+        self.log.write(ROUND, self.id, body + np.asarray(choices, dtype=np.int8).tobytes() + np.asarray(lives, dtype=np.int16).tobytes())
+        self.out_round[(np.asarray(lives) <= 0) & (self.out_round == 0)] = round_number
+
+    def leave(self, round_number, seat):
+        self.log.write(LEAVE, self.id, _LEAVE.pack(round_number, seat))
+        if not self.out_round[seat]:
+            self.out_round[seat] = round_number
+            self.left[seat] = True
+
+    def end(self, rounds, winner=None):
+        self.log.write(END, self.id, _END.pack(rounds, -1 if winner is None else winner))
+        if self.log.results is not None:
+            self.log.results.add((f"{self.id:016x}", self.source, self.seed, rounds, None if winner is None else self.names[winner]),
+                                 self.results(rounds, winner))
+
+    def results(self, rounds, winner=None):
+        # Une ligne par siège : (siège, joueur, agent, gagné, manches survécues, rang d'élimination, parti) ;
+        # le rang compte les sortis des manches précédentes, ex aequo dans une même manche
+        out = self.out_round
+        order = 1 + ((out[None, :] > 0) & (out[None, :] < out[:, None])).sum(axis=1)
+        return [(seat, name, agent, int(seat == winner), int(out[seat]) - 1 if out[seat] else rounds,
+                 int(order[seat]) if out[seat] else None, bool(self.left[seat]))
+                for seat, (name, agent) in enumerate(zip(self.names, self.agents))]
+
+
+# =====================
+# Lecture
+# =====================
+def read_records(path):
+    # (type, id de partie, corps) ; un enregistrement tronqué en fin de fichier est ignoré
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version = _FILE_HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path}: journal invalide")
+    pos = _FILE_HEADER.size
+    view = memoryview(data)
+    while pos + _RECORD.size <= len(data):
+        kind, size, game_id = _RECORD.unpack_from(data, pos)
+        pos += _RECORD.size
+        if pos + size > len(data):
+            break
+        yield kind, game_id, view[pos:pos+size]
+        pos += size
+
+
+def parse_round(body, n):
+    round_number, mult, mask, banned = _ROUND.unpack_from(body)
+    start = _ROUND.size
+    choices = np.frombuffer(body, dtype=np.int8, count=n, offset=start)
+    lives = np.frombuffer(body, dtype=np.int16, count=n, offset=start + n)
+    return round_number, mult / 10, mask, banned, choices, lives
+
+
+def banned_numbers(banned):
+    return np.flatnonzero(np.unpackbits(np.frombuffer(banned, dtype=np.uint8))[:101]).tolist()
+
+
+class ReplayGame:
+    def __init__(self, game_id, body):
+        self.id = game_id
+        self.seed, source, self.initial_lives, n = _GAME.unpack_from(body)
+        self.source = SOURCES[source]
+        self.names = bytes(body[_GAME.size:]).decode().split('\0')[:n]
+        self.lives = np.full(n, self.initial_lives, dtype=np.int64)  # vies courantes pendant la relecture
+        self.events = []
+        self.winner = None
+        self.rounds = 0
+        self.finished = False
+
+
+def replay(path):
+    # Reconstruit toutes les parties ; chaque manche garde les vies d'avant
+    # (vies initiales, règle 5, départs) pour être recomptée indépendamment
+    games = {}
+    for kind, game_id, body in read_records(path):
+        if kind == GAME:
+            games[game_id] = ReplayGame(game_id, body)
+            continue
+        game = games.get(game_id)
+        if game is None:
+            continue
+        if kind == ROUND:
+            round_number, mult, mask, banned, choices, lives = parse_round(body, len(game.names))
+            game.events.append(('round', round_number, mult, mask, banned, choices, game.lives.copy(), lives))
+            game.lives[:] = lives
+        elif kind == RULE:
+            round_number, rule = _RULE.unpack_from(body)
+            game.events.append(('rule', round_number, rule))
+            RULES[rule].on_activate(game.lives, None)
+        elif kind == LEAVE:
+            round_number, seat = _LEAVE.unpack_from(body)
+            game.events.append(('leave', round_number, seat))
+            game.lives[seat] = 0
+        elif kind == END:
+            game.rounds, winner = _END.unpack_from(body)
+            game.winner = None if winner < 0 else winner
+            game.finished = True
+    return games
+
+
+def rescore(games):
+    # Recalcule toutes les manches avec le moteur, par lots de parties de même
+    # taille ; renvoie les (id de partie, manche) dont les vies diffèrent du journal
+    by_size = {}
+    for game in games.values():
+        for event in game.events:
+            if event[0] == 'round':
+                by_size.setdefault(len(game.names), []).append((game.id,) + event[1:])
+    mismatches = []
+    n_rounds = 0
+    for rows in by_size.values():
+        ids, rounds, mult, mask, _, choices, before, after = zip(*rows)
+        res = resolve_round(np.stack(before), np.stack(choices).astype(np.int64), np.array(mult), np.array(mask))
+        bad = (res.lives != np.stack(after)).any(axis=1)
+        mismatches += [(ids[i], rounds[i]) for i in np.flatnonzero(bad)]
+        n_rounds += len(rows)
+    return n_rounds, mismatches
+
+
+def show(game):
+    print(f"Partie {game.id:016x} ({game.source}, graine {game.seed}) : {', '.join(game.names)} - {game.initial_lives} vies")
+    for event in game.events:
+        if event[0] == 'rule':
+            print(f"  manche {event[1]:>3} : règle {event[2]} activée")
+        elif event[0] == 'leave':
+            print(f"  manche {event[1]:>3} : {game.names[event[2]]} a quitté la partie")
+        else:
+            _, round_number, mult, mask, banned, choices, _, lives = event
+            # règles enregistrées (plugins compris) ; interdits de toute règle qui en pose
+            rules = [r for r in ALL_RULES if mask >> r & 1]
+            banned = banned_numbers(banned)
+            print(f"  manche {round_number:>3} : x{mult} règles {rules} choix {[c for c in choices.tolist() if c != NO_CHOICE]}"
+                  f" -> vies {lives.tolist()}" + (f" (interdits {banned})" if banned else ""))
+    if game.finished:
+        print(f"  fin après {game.rounds} manches : " + ("aucun gagnant" if game.winner is None else f"{game.names[game.winner]} gagne"))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Relecture du journal des parties")
+    parser.add_argument('path', nargs='?', default=JOURNAL_PATH)
+    parser.add_argument('--show', metavar='ID', help="affiche le déroulé d'une partie (id hexadécimal)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    games = replay(args.path)
+    if args.show:
+        show(games[int(args.show, 16)])
+    else:
+        n_rounds, mismatches = rescore(games)
+        elapsed = time.perf_counter() - start
+        print(f"{len(games)} parties, {n_rounds} manches recomptées en {elapsed:.2f} s ({len(games)/max(elapsed, 1e-9):.0f} parties/s)")
+        for game_id, round_number in mismatches[:20]:
+            print(f"  écart : partie {game_id:016x} manche {round_number}")
+        print("Journal cohérent" if not mismatches else f"{len(mismatches)} manche(s) en écart")
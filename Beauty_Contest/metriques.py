@@ -0,0 +1,129 @@
+# === metriques.py ===
+# Métriques du serveur au format texte Prometheus, sans dépendance.
+# Chaque histogramme appelle aussi les "hooks" de chronométrage
+# enregistrés (add_timing_hook), par exemple TimingLog qui écrit une
+# ligne JSON par mesure (LMS_TIMING_LOG).
+import asyncio
+import json
+import os
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+_metrics = []
+_hooks = []
+
+
+def add_timing_hook(hook):
+    # hook(nom, secondes) appelé à chaque mesure d'un histogramme
+    _hooks.append(hook)
+
+
+def remove_timing_hook(hook):
+    _hooks.remove(hook)
+
+
+def _format(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.value = 0
+        _metrics.append(self)
+
+    def inc(self, n=1):
+        self.value += n
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter", f"{self.name} {_format(self.value)}"]
+
+
+class Gauge:
+    # Valeur fixée par set(), ou lue à chaque export si fn est donné
+    def __init__(self, name, help, fn=None):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.value = 0
+        _metrics.append(self)
+
+    def set(self, value):
+        self.value = value
+
+    def render(self):
+        value = self.fn() if self.fn is not None else self.value
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {_format(value)}"]
+
+
+class Histogram:
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+        _metrics.append(self)
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+        for hook in _hooks:
+            hook(self.name, value)
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, n in zip(self.buckets, self.counts):
+            cumulative += n
+            lines.append(f'{self.name}_bucket{{le="{_format(bound)}"}} {cumulative}')
+        lines += [f"{self.name}_sum {_format(self.sum)}", f"{self.name}_count {self.count}"]
+        return lines
+
+
+def render():
+    lines = []
+    for metric in _metrics:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+async def monitor_loop_lag(histogram, gauge, interval=0.25):
+    # Retard de réveil d'un sleep : temps pendant lequel la boucle était occupée
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(loop.time() - start - interval, 0.0)
+        histogram.observe(lag)
+        gauge.set(lag)
+
+
+class TimingLog:
+    # Hook qui écrit {"t", "metric", "seconds"} en JSON, une ligne par mesure
+    def __init__(self, path):
+        self.file = open(path, "a", buffering=1)
+
+    def __call__(self, name, seconds):
+        self.file.write(json.dumps({'t': time.time(), 'metric': name, 'seconds': seconds, 'pid': os.getpid()}) + "\n")
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,273 @@
+# === modele.py ===
+# Chargement des modèles d'IA.
+#
+# Deux formats :
+#  - l'historique picklé (history_list : une liste de {nom: q_table}),
+#    produit par entrainement.py ;
+#  - un format dense, mappable en mémoire : pour chaque snapshot et chaque
+#    IA, un tableau float32 indexé par l'état (lives, mean_others,
+#    mult_disc, round_number) puis par l'action. Les états jamais vus
+#    valent NaN. Seul le snapshot demandé est lu au démarrage.
+#
+#   python modele.py modele_ia_beauty_contest modele_ia_beauty_contest.qt
+import argparse
+import json
+import os
+import pickle
+import struct
+import threading
+
+import numpy as np
+
+from moteur import N_ACTIONS
+
+MODEL_PATH = "modele_ia_beauty_contest"
+DENSE_PATH = "modele_ia_beauty_contest.qt"
+
+MAGIC = b"LMSQ"
+VERSION = 1
+_ALIGN = 64
+# magic, version, taille de l'en-tête JSON
+_PREFIX = struct.Struct("<4sHI")
+
+
+def load_history(path=MODEL_PATH):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def save_history(history_list, path=MODEL_PATH):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(history_list, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def is_dense(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class DenseQTable:
+    # Q-table d'une IA, vue sur le tableau dense. S'utilise comme le dict
+    # d'origine : `state in q_table`, `q_table[state]`, `q_table.get(state)`.
+    def __init__(self, array, mult_min):
+        self.array = array  # (lives, mean_others, mult, round, action)
+        self.mult_min = mult_min
+
+    def _index(self, state):
+        lives, mean_others, mult_disc, round_number = state
+        idx = (lives, mean_others, mult_disc - self.mult_min, round_number)
+        for i, n in zip(idx, self.array.shape):
+            if not 0 <= i < n:
+                return None
+        return idx
+
+    def get(self, state, default=None):
+        idx = self._index(state)
+        if idx is None:
+            return default
+        row = self.array[idx]
+        return default if np.isnan(row[0]) else row
+
+    def __contains__(self, state):
+        return self.get(state) is not None
+
+    def __getitem__(self, state):
+        row = self.get(state)
+        if row is None:
+            raise KeyError(state)
+        return row
+
+    def __bool__(self):
+        return True
+
+    def lookup(self, lives, mean_others, mult_disc, round_number):
+        # Recherche par lot : renvoie (q_vals, trouvé), NaN pour les états inconnus
+        idx = np.broadcast_arrays(np.asarray(lives), np.asarray(mean_others),
+                                  np.asarray(mult_disc) - self.mult_min, np.asarray(round_number))
+        inside = np.ones(idx[0].shape, dtype=bool)
+        for i, n in zip(idx, self.array.shape):
+            inside &= (i >= 0) & (i < n)
+        clipped = tuple(np.where(inside, i, 0) for i in idx)
+        q_vals = np.where(inside[:, None], self.array[clipped], np.nan)
+        return q_vals, ~np.isnan(q_vals[:, 0])
+
+
+def _table_bounds(q_tables):
+    states = np.array([s for q_table in q_tables.values() for s in q_table.keys()], dtype=np.int64).reshape(-1, 4)
+    if len(states) == 0:
+        return (1, 1, 0, 1, 1)
+    lo = states.min(axis=0)
+    hi = states.max(axis=0)
+    if lo[0] < 0 or lo[1] < 0 or lo[3] < 0:
+        raise ValueError("états négatifs non représentables dans le format dense")
+    return (int(hi[0])+1, int(hi[1])+1, int(lo[2]), int(hi[2]-lo[2])+1, int(hi[3])+1)
+
+
+def save_dense(snapshots, path, snapshot_ids=None):
+    # snapshots : liste de {nom: q_table} (même IA dans chaque snapshot)
+    names = list(snapshots[0].keys())
+    bounds = [_table_bounds(q_tables) for q_tables in snapshots]
+    lives, mean, rounds = (max(b[i] for b in bounds) for i in (0, 1, 4))
+    mult_min = min(b[2] for b in bounds)
+    mult = max(b[2] + b[3] for b in bounds) - mult_min
+    shape = (len(snapshots), len(names), lives, mean, mult, rounds, N_ACTIONS)
+    header = {
+        'version': VERSION,
+        'agents': names,
+        'snapshots': list(snapshot_ids if snapshot_ids is not None else range(len(snapshots))),
+        'shape': shape,
+        'mult_min': mult_min,
+        'dtype': '<f4',
+    }
+    raw = json.dumps(header).encode()
+    offset = -(-(_PREFIX.size + len(raw)) // _ALIGN) * _ALIGN
+    raw = raw.ljust(offset - _PREFIX.size, b" ")
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, VERSION, len(raw)))
+        f.write(raw)
+    data = np.memmap(tmp, dtype='<f4', mode='r+', offset=offset, shape=shape)
+    data[:] = np.nan
+    for s, q_tables in enumerate(snapshots):
+        for a, name in enumerate(names):
+            q_table = q_tables[name]
+            if not q_table:
+                continue
+            idx = np.array(list(q_table.keys()), dtype=np.int64)
+            idx[:, 2] -= mult_min
+            data[s, a][tuple(idx.T)] = np.array(list(q_table.values()), dtype=np.float32)
+    data.flush()
+    del data
+    os.replace(tmp, path)
+
+
+def read_header(path):
+    with open(path, "rb") as f:
+        magic, version, size = _PREFIX.unpack(f.read(_PREFIX.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path}: format de modèle inconnu")
+        if version != VERSION:
+            raise ValueError(f"{path}: version {version} non supportée")
+        header = json.loads(f.read(size))
+    header['offset'] = _PREFIX.size + size
+    return header
+
+
+def load_dense(path, snapshot=-1):
+    # Renvoie {nom: DenseQTable} pour un snapshot, sans lire les autres
+    header = read_header(path)
+    data = np.memmap(path, dtype=header['dtype'], mode='r', offset=header['offset'], shape=tuple(header['shape']))
+    if snapshot >= 0:
+        # indice du snapshot dans l'historique d'origine
+        if snapshot not in header['snapshots']:
+            raise IndexError(f"{path}: snapshot {snapshot} absent (disponibles : {header['snapshots']})")
+        snapshot = header['snapshots'].index(snapshot)
+    tables = data[snapshot]
+    return {name: DenseQTable(tables[a], header['mult_min']) for a, name in enumerate(header['agents'])}
+
+
+def default_path():
+    return DENSE_PATH if os.path.exists(DENSE_PATH) else MODEL_PATH
+
+
+def load_q_tables(path=None, snapshot=-1):
+    # Q-tables d'un snapshot ; le format dense est préféré s'il existe
+    path = path or default_path()
+    if is_dense(path):
+        return load_dense(path, snapshot)
+    return load_history(path)[snapshot]
+
+
+def snapshot_ids(path=None):
+    # Indices d'origine des snapshots d'un modèle, dans l'ordre
+    path = path or default_path()
+    if is_dense(path):
+        return read_header(path)['snapshots']
+    return list(range(len(load_history(path))))
+
+
+def model_stamp(path=None):
+    # Identité du fichier modèle : chemin absolu, date de modification, taille
+    path = os.path.abspath(path or default_path())
+    st = os.stat(path)
+    return {'path': path, 'mtime_ns': st.st_mtime_ns, 'size': st.st_size}
+
+
+def export_source(path=None, snapshot=-1):
+    # (indice d'origine du snapshot, source) à écrire dans l'en-tête d'un
+    # fichier dérivé du modèle (politique.py, reseau.py)
+    ids = snapshot_ids(path)
+    source = dict(model_stamp(path), snapshots=ids)
+    return (ids[snapshot] if snapshot < 0 else snapshot), source
+
+
+def export_matches(header, path=None, snapshot=-1):
+    # Vrai si un fichier exporté (en-tête avec 'snapshot' et 'source') vient
+    # de ce snapshot de ce modèle, et que le modèle n'a pas changé depuis
+    source = header.get('source')
+    if not source:
+        return False
+    try:
+        if any(source[k] != v for k, v in model_stamp(path).items()):
+            return False
+    except OSError:
+        return False
+    ids = source['snapshots']
+    if snapshot < 0:
+        if -snapshot > len(ids):
+            return False
+        snapshot = ids[snapshot]
+    return snapshot == header.get('snapshot')
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_q_tables(path=None, snapshot=-1):
+    # Comme load_q_tables, mais chargé une seule fois par processus.
+    # Un appel pendant un préchargement attend la fin de celui-ci.
+    key = (os.path.abspath(path or default_path()), snapshot)
+    with _cache_lock:
+        if key not in _cache:
+            _cache[key] = load_q_tables(*key)
+        return _cache[key]
+
+
+def preload(path=None, snapshot=-1, loader=None):
+    # Charge le modèle en tâche de fond (ex : pendant l'écran d'accueil)
+    loader = loader or get_q_tables
+
+    def target():
+        try:
+            loader(path, snapshot)
+        except Exception:
+            pass  # l'erreur réapparaîtra au premier get_q_tables
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread
+
+
+def convert(src, dst, snapshots=(-1,)):
+    # Convertit l'historique picklé en format dense (snapshots=None : tous)
+    history_list = load_history(src)
+    if snapshots is None:
+        snapshots = range(len(history_list))
+    ids = [range(len(history_list))[s] for s in snapshots]
+    save_dense([history_list[i] for i in ids], dst, ids)
+    return ids
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Conversion de l'historique picklé vers le format dense")
+    parser.add_argument('src', nargs='?', default=MODEL_PATH)
+    parser.add_argument('dst', nargs='?', default=DENSE_PATH)
+    parser.add_argument('--snapshot', type=int, action='append', help="indice(s) de snapshot, par défaut le dernier")
+    parser.add_argument('--all', action='store_true', help="convertir tous les snapshots")
+    args = parser.parse_args()
+
+    ids = convert(args.src, args.dst, None if args.all else (args.snapshot or [-1]))
+    print(f"{len(ids)} snapshot(s) écrit(s) dans {args.dst} ({os.path.getsize(args.dst)/1e6:.1f} Mo)")
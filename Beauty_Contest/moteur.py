@@ -0,0 +1,479 @@
+# === moteur.py ===
+# Moteur de résolution des manches, sans interface, partagé par
+# Local_Game, IA_vs_Human, IA_Training et serveur.
+# Chaque partie a son propre générateur NumPy (new_rng), créé depuis une
+# graine journalisée : une partie se rejoue à l'identique avec sa graine.
+#
+# Les règles sont des objets Rule enregistrés par numéro (register_rule) ;
+# leurs crochets ne sont appelés que si la règle est active :
+#   pre_round(setup, rng)   paramètres de la manche (multiplicateur, temps, interdits)
+#   score(ctx, on)          résolution, avant le calcul des pertes
+#   post_round(ctx, on)     résolution, sur les vies après la manche
+#   on_activate(lives, rng) à l'activation (lives : tableau des vies, modifié sur place)
+# Une partie garde ses règles dans un RuleSet : masque de bits et pipeline
+# des crochets utiles, recompilé à chaque activation.
+import secrets
+from collections import namedtuple
+
+import numpy as np
+
+MULTIPLIERS = [0.5,0.6,0.7,0.8,0.9,1.1,1.2,1.3,1.4,1.5]
+ALL_RULES = []  # numéros des règles enregistrées, complété par register_rule
+N_ACTIONS = 21  # actions des IA : 0, 5, ..., 100
+NO_CHOICE = -1  # joueur vivant qui n'a pas répondu (serveur)
+
+# Distance donnée à un joueur sans réponse : jamais le plus proche,
+# sauf si personne n'a répondu (tout le monde est alors à égalité).
+_FAR = 10**6
+_DEAD = np.iinfo(np.int64).max
+
+# target_real, target : (G,) ; winners, exact : (G,N) booléens
+# duel, halved : (G,) booléens ; lives : (G,N) vies après la manche
+RoundResult = namedtuple('RoundResult', 'target_real target winners exact duel halved lives')
+# Crochets à appeler pour un masque de règles, dans l'ordre des numéros
+Pipeline = namedtuple('Pipeline', 'pre_round score post_round')
+
+
+_shared_rng = np.random.default_rng()  # pour les appels sans générateur de partie
+
+
+def new_seed():
+    return secrets.randbits(63)
+
+
+def new_rng(seed=None):
+    return np.random.default_rng(seed)
+
+
+def get_rng(rng=None):
+    return _shared_rng if rng is None else rng
+
+
+def rng_choice(rng, seq):
+    # Élément tiré au hasard, du type d'origine (pas de scalaire NumPy)
+    return seq[int(get_rng(rng).integers(len(seq)))]
+
+
+def draw_multiplier(rng=None):
+    return rng_choice(rng, MULTIPLIERS)
+
+
+def draw_round_time(rng=None):
+    # Règle 4 : temps de réflexion entre 7 et 30 s
+    return int(get_rng(rng).integers(7, 31))
+
+
+def rules_mask(rules):
+    if isinstance(rules, RuleSet):
+        return rules.mask
+    mask = 0
+    for r in rules:
+        mask |= 1 << r
+    return mask
+
+
+def has_rule(mask, rule):
+    return (np.asarray(mask) >> rule) & 1 == 1
+
+
+# =====================
+# Règles
+# =====================
+RULES = {}  # numéro -> Rule
+_pipelines = {}  # masque -> Pipeline
+
+
+class Rule:
+    # Règle de base : aucun crochet ; les sous-classes redéfinissent ceux qui servent
+    number = 0
+    text = ""
+    announce = None  # message affiché à l'activation, s'il y en a un
+
+    def pre_round(self, setup, rng):
+        pass
+
+    def score(self, ctx, on):
+        # on : (G,) booléens, parties du lot où la règle est active
+        pass
+
+    def post_round(self, ctx, on):
+        pass
+
+    def on_activate(self, lives, rng):
+        pass
+
+
+def register_rule(rule):
+    # Le numéro sert de bit dans les masques ; le journal les stocke sur 8 bits (1..7)
+    if not 1 <= rule.number <= 7 or rule.number in RULES:
+        raise ValueError(f"numéro de règle invalide ou déjà pris : {rule.number}")
+    RULES[rule.number] = rule
+    ALL_RULES[:] = sorted(RULES)
+    _pipelines.clear()
+    return rule
+
+
+def compile_rules(mask):
+    # Pipeline des crochets redéfinis par les règles du masque, mis en cache
+    pipeline = _pipelines.get(mask)
+    if pipeline is None:
+        active = [RULES[r] for r in ALL_RULES if mask >> r & 1]
+        hooks = [tuple(rule for rule in active if getattr(type(rule), hook) is not getattr(Rule, hook))
+                 for hook in Pipeline._fields]
+        pipeline = _pipelines[mask] = Pipeline(*hooks)
+    return pipeline
+
+
+class RoundSetup:
+    # Paramètres d'une manche, modifiés par les crochets pre_round
+    def __init__(self, multiplier, round_time=None):
+        self.multiplier = multiplier
+        self.round_time = round_time  # None : partie sans chrono (entraînement, console)
+        self.banned = set()
+
+
+class RuleSet:
+    # Règles actives d'une partie, dans l'ordre d'activation
+    def __init__(self, rules=()):
+        self.rules = []
+        self.mask = 0
+        self.pipeline = compile_rules(0)
+        for r in rules:
+            self.add(r)
+
+    def add(self, rule):
+        self.rules.append(rule)
+        self.mask |= 1 << rule
+        self.pipeline = compile_rules(self.mask)
+
+    def __contains__(self, rule):
+        return self.mask >> rule & 1 == 1
+
+    def __iter__(self):
+        return iter(self.rules)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def pre_round(self, multiplier, round_time=None, rng=None):
+        setup = RoundSetup(multiplier, round_time)
+        rng = get_rng(rng)
+        for rule in self.pipeline.pre_round:
+            rule.pre_round(setup, rng)
+        return setup
+
+
+class RoundContext:
+    # Tableaux (G,) et (G,N) d'une résolution, lus et modifiés par les crochets :
+    # lives, choices, multiplier, alive, answered, n_alive, target, dist,
+    # winners, exact ; puis duel, any_exact, new_lives, halved pour post_round
+    pass
+
+
+class ChangingMultiplier(Rule):
+    number = 1
+    text = "La valeur multiplicative change chaque round"
+
+    def pre_round(self, setup, rng):
+        setup.multiplier = draw_multiplier(rng)
+
+
+class FarthestProtected(Rule):
+    number = 2
+    text = "Les joueurs les plus éloignés sont aussi protégés (sauf si seulement 2 joueurs restants)"
+
+    def score(self, ctx, on):
+        on = on & (ctx.n_alive > 2)
+        far_dist = np.where(ctx.answered, ctx.dist, -1).max(axis=1, keepdims=True)
+        ctx.winners |= ctx.answered & (ctx.dist == far_dist) & on[:, None]
+
+
+class ExactHit(Rule):
+    number = 3
+    text = "Si un joueur obtient la valeur exacte, les autres perdent 2 vies"
+
+    def score(self, ctx, on):
+        ctx.exact |= ctx.answered & (ctx.choices == ctx.target[:, None]) & on[:, None]
+
+
+class RandomTime(Rule):
+    number = 4
+    text = "Le temps de réflexion devient aléatoire entre 7 et 30s"
+
+    def pre_round(self, setup, rng):
+        if setup.round_time is not None:
+            setup.round_time = draw_round_time(rng)
+
+
+class HalveLives(Rule):
+    number = 5
+    text = "Les vies de tous les joueurs sont divisées par 2 (arrondi supérieur)"
+    announce = "Application immédiate de la règle 5: vies divisées par 2"
+
+    def post_round(self, ctx, on):
+        # hors duel et valeur exacte
+        halved = on & ~ctx.duel & ~ctx.any_exact
+        ctx.new_lives = np.where(halved[:, None] & (ctx.new_lives > 0), (ctx.new_lives + 1) // 2, ctx.new_lives)
+        ctx.halved |= halved
+
+    def on_activate(self, lives, rng):
+        alive = lives > 0
+        lives[alive] = (lives[alive] + 1) // 2
+
+
+class BannedNumbers(Rule):
+    number = 6
+    text = "20 nombres aléatoires (0..100) sont interdits chaque round"
+
+    def pre_round(self, setup, rng):
+        # 20 nombres interdits (0..100) chaque manche, tirés en un appel
+        setup.banned = set(rng.choice(101, 20, replace=False).tolist())
+
+
+for _rule in (ChangingMultiplier(), FarthestProtected(), ExactHit(), RandomTime(), HalveLives(), BannedNumbers()):
+    register_rule(_rule)
+
+
+def resolve_round(lives, choices, multiplier, rules=0):
+    # lives, choices : (N,) pour une partie ou (G,N) pour G parties en parallèle.
+    # multiplier, rules (masque de bits) : scalaire ou (G,).
+    # Les joueurs morts (vies <= 0) sont ignorés, NO_CHOICE = pas de réponse.
+    single = np.ndim(lives) == 1
+    lives = np.atleast_2d(np.asarray(lives, dtype=np.int64))
+    choices = np.atleast_2d(np.asarray(choices, dtype=np.int64))
+    g = lives.shape[0]
+    multiplier = np.broadcast_to(np.asarray(multiplier, dtype=np.float64), (g,))
+    rules = np.broadcast_to(np.asarray(rules, dtype=np.int64), (g,))
+
+    alive = lives > 0
+    answered = alive & (choices >= 0)
+    n_alive = alive.sum(axis=1)
+    n_answered = answered.sum(axis=1)
+
+    # Cible : moyenne des réponses x multiplicateur, arrondie comme round()
+    total = np.where(answered, choices, 0).sum(axis=1)
+    avg = np.divide(total, n_answered, out=np.zeros(g), where=n_answered > 0)
+    target_real = avg * multiplier
+    target = np.rint(target_real).astype(np.int64)
+
+    # Distances et plus proches
+    dist = np.abs(choices - target[:, None])
+    dist = np.where(answered, dist, _FAR)
+    dist = np.where(alive, dist, _DEAD)
+    winners = alive & (dist == dist.min(axis=1, keepdims=True))
+
+    # Crochets de score des règles actives dans au moins une partie du lot
+    pipeline = compile_rules(int(np.bitwise_or.reduce(rules)))
+    ctx = RoundContext()
+    ctx.lives, ctx.choices, ctx.multiplier = lives, choices, multiplier
+    ctx.alive, ctx.answered, ctx.n_alive = alive, answered, n_alive
+    ctx.target, ctx.dist, ctx.winners = target, dist, winners
+    ctx.exact = np.zeros_like(answered)
+    for rule in pipeline.score:
+        rule.score(ctx, has_rule(rules, rule.number))
+    winners, exact = ctx.winners, ctx.exact
+    any_exact = exact.any(axis=1)
+
+    # Duel final : 0 contre 100 à deux joueurs
+    low = np.where(answered, choices, 101).min(axis=1)
+    high = np.where(answered, choices, -1).max(axis=1)
+    duel = (n_alive == 2) & (n_answered == 2) & (low == 0) & (high == 100) & (multiplier != 1)
+    duel_pick = np.where(multiplier < 1, 100, 0)
+    duel_winner = answered & (choices == duel_pick[:, None])
+
+    # Valeur exacte (règle 3) : les autres perdent 2 vies
+    loss = np.where(winners, 0, 1)
+    loss = np.where(any_exact[:, None], np.where(exact, 0, 2), loss)
+    loss = np.where(duel[:, None], np.where(duel_winner, 0, 1), loss)
+
+    ctx.duel, ctx.any_exact = duel, any_exact
+    ctx.new_lives = lives - np.where(alive, loss, 0)
+    ctx.halved = np.zeros(g, dtype=bool)
+    for rule in pipeline.post_round:
+        rule.post_round(ctx, has_rule(rules, rule.number))
+    new_lives, halved = ctx.new_lives, ctx.halved
+
+    winners = np.where(duel[:, None], duel_winner, np.where(any_exact[:, None], exact, winners))
+    exact &= ~duel[:, None]
+    result = RoundResult(target_real, target, winners, exact, duel, halved, new_lives)
+    if single:
+        result = RoundResult(*(field[0] for field in result))
+    return result
+
+
+def encode_state(lives, multiplier, round_number, lives_list):
+    # État vu par une IA : (vies, moyenne des vies des autres, multiplicateur x10, manche)
+    mean_others = int(sum(lives_list)/len(lives_list)) if lives_list else 0
+    mult_disc = int(multiplier*10)
+    return (lives, mean_others, mult_disc, round_number)
+
+
+def choose_action(q_table, state, banned=(), epsilon=0, rng=None):
+    # Meilleure action autorisée selon la Q-table, hasard si exploration ou état inconnu
+    if hasattr(q_table, 'choose_action'):
+        # politique précalculée (politique.GreedyPolicy, reseau.NetPolicy)
+        return q_table.choose_action(state, banned, epsilon, rng)
+    rng = get_rng(rng)
+    possible_actions = [i*5 for i in range(N_ACTIONS) if i*5 not in banned]
+    if not possible_actions:
+        possible_actions = [i*5 for i in range(N_ACTIONS)]
+    if not q_table or rng.random() < epsilon or state not in q_table:
+        return rng_choice(rng, possible_actions)
+    q_vals = q_table[state]
+    return max(possible_actions, key=lambda x: q_vals[x//5])
+
+
+def pick_new_rule(active_rules, rng=None):
+    remaining = [r for r in ALL_RULES if r not in active_rules]
+    if not remaining:
+        return None
+    return rng_choice(rng, remaining)
+
+
+class GameState:
+    # État des joueurs d'une partie, stocké en tableaux NumPy. Les totaux
+    # (joueurs vivants, somme de leurs vies, réponses de la manche) sont
+    # tenus à jour à chaque changement : compter les vivants ou encoder
+    # l'état d'un siège se fait en O(1), sans parcourir les autres joueurs.
+    def __init__(self, names, lives):
+        self.names = list(names)
+        n = len(self.names)
+        self.lives = np.zeros(n, dtype=np.int64)
+        self.lives[:] = lives
+        self.last_choice = np.full(n, NO_CHOICE, dtype=np.int64)
+        self.eliminated = np.zeros(n, dtype=bool)
+        self.round_choice = np.full(n, NO_CHOICE, dtype=np.int64)  # réponses de la manche en cours
+        self.answered = 0
+        self.choice_sum = 0
+        self._recount()
+
+    def __len__(self):
+        return len(self.names)
+
+    def _recount(self):
+        # après un changement de vies en bloc (manche, règle 5)
+        alive = self.lives > 0
+        self.n_alive = int(np.count_nonzero(alive))
+        self.lives_sum = int(self.lives[alive].sum())
+
+    def set_lives(self, index, value):
+        old, value = int(self.lives[index]), int(value)
+        self.lives[index] = value
+        self.n_alive += int(value > 0) - int(old > 0)
+        self.lives_sum += max(value, 0) - max(old, 0)
+
+    def add(self, name, lives):
+        self.names.append(name)
+        self.lives = np.append(self.lives, lives)
+        self.last_choice = np.append(self.last_choice, NO_CHOICE)
+        self.eliminated = np.append(self.eliminated, False)
+        self.round_choice = np.append(self.round_choice, NO_CHOICE)
+        self.n_alive += int(lives > 0)
+        self.lives_sum += max(int(lives), 0)
+        return len(self.names) - 1
+
+    def alive_mask(self):
+        return self.lives > 0
+
+    def alive_count(self):
+        return self.n_alive
+
+    def alive_indices(self):
+        return np.flatnonzero(self.lives > 0)
+
+    def mean_others(self, index):
+        # moyenne entière des vies des autres joueurs vivants (encode_state)
+        own = max(int(self.lives[index]), 0)
+        others = self.n_alive - (own > 0)
+        return (self.lives_sum - own) // others if others > 0 else 0
+
+    def encode(self, index, multiplier, round_number):
+        # même état que encode_state, sans la liste des vies des autres
+        return (int(self.lives[index]), self.mean_others(index), int(multiplier*10), round_number)
+
+    # Réponses d'une manche, reçues une à une
+    def new_round(self):
+        self.round_choice[:] = NO_CHOICE
+        self.answered = 0
+        self.choice_sum = 0
+
+    def answer(self, index, value):
+        old = int(self.round_choice[index])
+        if old != NO_CHOICE:
+            self.answered -= 1
+            self.choice_sum -= old
+        self.round_choice[index] = value
+        self.answered += 1
+        self.choice_sum += value
+
+    def all_answered(self):
+        return self.answered >= self.n_alive
+
+    def resolve(self, choices, multiplier, active_rules):
+        choices = np.asarray(choices, dtype=np.int64)
+        result = resolve_round(self.lives, choices, multiplier, rules_mask(active_rules))
+        alive = self.lives > 0
+        self.last_choice[alive] = choices[alive]
+        self.lives[:] = result.lives
+        self._recount()
+        return result
+
+    def remove(self, index):
+        # Joueur parti : il sort de la partie sans compter comme éliminé ;
+        # sa réponse éventuelle ne compte plus
+        if self.round_choice[index] != NO_CHOICE:
+            self.answered -= 1
+            self.choice_sum -= int(self.round_choice[index])
+            self.round_choice[index] = NO_CHOICE
+        self.set_lives(index, 0)
+        self.eliminated[index] = True
+
+    def newly_eliminated(self):
+        idx = np.flatnonzero((self.lives <= 0) & ~self.eliminated)
+        self.eliminated[idx] = True
+        return idx.tolist()
+
+    def activate_rule(self, active_rules, rng=None):
+        # Ajoute une règle au hasard à un RuleSet et applique son effet immédiat
+        new = pick_new_rule(active_rules, rng)
+        if new is None:
+            return None
+        active_rules.add(new)
+        RULES[new].on_activate(self.lives, get_rng(rng))
+        self._recount()
+        return new
+
+
+class Seat:
+    # Joueur adossé à une ligne de GameState
+    def __init__(self, state, index):
+        self.state = state
+        self.index = index
+
+    @property
+    def name(self):
+        return self.state.names[self.index]
+
+    @property
+    def lives(self):
+        return int(self.state.lives[self.index])
+
+    @lives.setter
+    def lives(self, value):
+        self.state.set_lives(self.index, value)
+
+    @property
+    def last_choice(self):
+        c = int(self.state.last_choice[self.index])
+        return None if c == NO_CHOICE else c
+
+    @last_choice.setter
+    def last_choice(self, value):
+        self.state.last_choice[self.index] = NO_CHOICE if value is None else value
+
+    def get_state(self, multiplier, round_number):
+        return self.state.encode(self.index, multiplier, round_number)
+
+    @property
+    def _was_elim(self):
+        return bool(self.state.eliminated[self.index])
@@ -0,0 +1,222 @@
+# === politique.py ===
+# Politique gloutonne précalculée des IA.
+# Pour chaque état, on garde le classement des 21 actions par Q-valeur
+# décroissante (int8) : le coup d'une IA est la première action du
+# classement qui n'est pas interdite (règle 6), soit une simple lecture
+# de tableau au lieu d'un max sur les actions à chaque coup.
+#
+#   python politique.py --model modele_ia_beauty_contest modele_ia_beauty_contest.pol
+import argparse
+import json
+import os
+import struct
+import threading
+
+import numpy as np
+
+from modele import default_path, export_matches, export_source, get_q_tables
+from moteur import N_ACTIONS, get_rng, rng_choice
+from reseau import is_net_file, load_net, read_net_header
+
+POLICY_PATH = "modele_ia_beauty_contest.pol"
+
+MAGIC = b"LMSP"
+VERSION = 1
+_ALIGN = 64
+_PREFIX = struct.Struct("<4sHI")
+_ACTIONS = np.arange(N_ACTIONS) * 5
+_ALL_ACTIONS = [i*5 for i in range(N_ACTIONS)]
+
+
+def dense_q_values(q_table):
+    # (tableau (lives, mean_others, mult, round, action), mult_min) ; NaN = état inconnu
+    if hasattr(q_table, 'array'):
+        return np.asarray(q_table.array), q_table.mult_min
+    if not q_table:
+        return np.full((1, 1, 1, 1, N_ACTIONS), np.nan), 0
+    idx = np.array(list(q_table.keys()), dtype=np.int64)
+    mult_min = int(idx[:, 2].min())
+    idx[:, 2] -= mult_min
+    q_vals = np.full(tuple(idx.max(axis=0) + 1) + (N_ACTIONS,), np.nan)
+    q_vals[tuple(idx.T)] = np.array(list(q_table.values()), dtype=np.float64)
+    return q_vals, mult_min
+
+
+def rank_actions(q_vals):
+    # Actions par Q-valeur décroissante ; à égalité la plus petite d'abord,
+    # comme max() sur les actions dans l'ordre. -1 pour les états inconnus.
+    ranking = np.argsort(-q_vals, axis=-1, kind='stable').astype(np.int8)
+    ranking[np.isnan(q_vals[..., 0])] = -1
+    return ranking
+
+
+class GreedyPolicy:
+    # Politique d'une IA ; même interface que moteur.choose_action
+    def __init__(self, ranking, mult_min):
+        self.ranking = ranking  # (lives, mean_others, mult, round, action)
+        self.mult_min = mult_min
+
+    @classmethod
+    def from_q_table(cls, q_table):
+        q_vals, mult_min = dense_q_values(q_table)
+        return cls(rank_actions(q_vals), mult_min)
+
+    def _row(self, state):
+        lives, mean_others, mult_disc, round_number = state
+        idx = (lives, mean_others, mult_disc - self.mult_min, round_number)
+        for i, n in zip(idx, self.ranking.shape):
+            if not 0 <= i < n:
+                return None
+        row = self.ranking[idx]
+        return None if row[0] < 0 else row
+
+    def __contains__(self, state):
+        return self._row(state) is not None
+
+    def __bool__(self):
+        return True
+
+    def choose_action(self, state, banned=(), epsilon=0, rng=None):
+        rng = get_rng(rng)
+        row = self._row(state)
+        # tirage consommé comme dans moteur.choose_action : même graine, mêmes parties
+        if rng.random() < epsilon or row is None:
+            return rng_choice(rng, [a for a in _ALL_ACTIONS if a not in banned] or _ALL_ACTIONS)
+        if banned:
+            for a in row:
+                if a*5 not in banned:
+                    return int(a)*5
+        return int(row[0])*5
+
+    def choose_batch(self, lives, mean_others, mult_disc, round_number, banned, rng):
+        # Coups d'un lot d'états ; banned : (B,101) booléens, rng : numpy Generator
+        idx = np.broadcast_arrays(np.asarray(lives), np.asarray(mean_others),
+                                  np.asarray(mult_disc) - self.mult_min, np.asarray(round_number))
+        inside = np.ones(idx[0].shape, dtype=bool)
+        for i, n in zip(idx, self.ranking.shape):
+            inside &= (i >= 0) & (i < n)
+        rows = self.ranking[tuple(np.where(inside, i, 0) for i in idx)].astype(np.int64)
+        known = inside & (rows[:, 0] >= 0)
+        rows = np.where(known[:, None], rows, 0)
+
+        # première action du classement qui n'est pas interdite (la meilleure si toutes le sont)
+        ok = ~np.take_along_axis(banned, rows * 5, axis=1)
+        action = np.take_along_axis(rows, ok.argmax(axis=1)[:, None], axis=1)[:, 0]
+
+        unknown = np.flatnonzero(~known)
+        if len(unknown):
+            allowed = ~banned[unknown][:, _ACTIONS]
+            allowed[~allowed.any(axis=1)] = True
+            keys = np.where(allowed, rng.random(allowed.shape), -1)
+            action[unknown] = keys.argmax(axis=1)
+        return action * 5
+
+
+def save_policies(policies, path, snapshot=None, source=None):
+    # snapshot, source : indice d'origine du snapshot et identité du modèle (modele.export_source)
+    # Toutes les IA dans un même tableau : on agrandit au besoin avec -1
+    names = list(policies.keys())
+    mult_min = min(p.mult_min for p in policies.values())
+    ends = np.max([np.array(p.ranking.shape[:4]) + [0, 0, p.mult_min - mult_min, 0] for p in policies.values()], axis=0)
+    shape = (len(names),) + tuple(int(n) for n in ends) + (N_ACTIONS,)
+    header = {'version': VERSION, 'agents': names, 'shape': shape, 'mult_min': mult_min, 'snapshot': snapshot, 'source': source}
+    raw = json.dumps(header).encode()
+    offset = -(-(_PREFIX.size + len(raw)) // _ALIGN) * _ALIGN
+    raw = raw.ljust(offset - _PREFIX.size, b" ")
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, VERSION, len(raw)))
+        f.write(raw)
+    data = np.memmap(tmp, dtype=np.int8, mode='r+', offset=offset, shape=shape)
+    data[:] = -1
+    for a, name in enumerate(names):
+        p = policies[name]
+        l, m, k, r, _ = p.ranking.shape
+        k0 = p.mult_min - mult_min
+        data[a, :l, :m, k0:k0+k, :r] = p.ranking
+    data.flush()
+    del data
+    os.replace(tmp, path)
+
+
+def is_policy_file(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def read_policy_header(path=POLICY_PATH):
+    # (en-tête, position des données)
+    with open(path, "rb") as f:
+        magic, version, size = _PREFIX.unpack(f.read(_PREFIX.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: fichier de politique invalide")
+        return json.loads(f.read(size)), _PREFIX.size + size
+
+
+def load_policies(path=POLICY_PATH):
+    header, offset = read_policy_header(path)
+    data = np.memmap(path, dtype=np.int8, mode='r', offset=offset, shape=tuple(header['shape']))
+    return {name: GreedyPolicy(data[a], header['mult_min']) for a, name in enumerate(header['agents'])}
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def exported_header(path):
+    # En-tête d'un fichier de politique ou de réseau exporté, None si ce n'en est pas un
+    if is_policy_file(path):
+        return read_policy_header(path)[0]
+    if is_net_file(path):
+        return read_net_header(path)[0]
+    return None
+
+
+def _use_default_export(snapshot):
+    # Le .pol par défaut sert s'il vient du snapshot demandé du modèle par
+    # défaut, inchangé depuis l'export ; sans modèle, il est seul disponible
+    if not os.path.exists(POLICY_PATH):
+        return False
+    header = read_policy_header(POLICY_PATH)[0]
+    if not os.path.exists(default_path()):
+        return snapshot in (-1, header.get('snapshot'))
+    return export_matches(header, None, snapshot)
+
+
+def get_policies(path=None, snapshot=-1):
+    # Politiques des IA, chargées une fois par processus : fichier de
+    # politique exporté par défaut s'il vient du snapshot demandé du modèle
+    # actuel, fichier exporté donné (ou réseau, reseau.py), sinon calculées
+    # depuis les Q-tables
+    if path is None and _use_default_export(snapshot):
+        path = POLICY_PATH
+    key = (path and os.path.abspath(path), snapshot)
+    with _cache_lock:
+        if key not in _cache:
+            header = exported_header(path) if path else None
+            # fichier choisi explicitement : -1 le prend tel quel, un autre
+            # snapshot doit être celui exporté
+            if header is not None and snapshot != -1 and snapshot != header.get('snapshot'):
+                raise ValueError(f"{path}: exporté depuis le snapshot {header.get('snapshot')}, snapshot {snapshot} demandé")
+            if path and is_policy_file(path):
+                _cache[key] = load_policies(path)
+            elif path and is_net_file(path):
+                _cache[key] = load_net(path)
+            else:
+                q_tables = get_q_tables(path, snapshot)
+                _cache[key] = {name: GreedyPolicy.from_q_table(q) for name, q in q_tables.items()}
+        return _cache[key]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export de la politique gloutonne des IA")
+    parser.add_argument('dst', nargs='?', default=POLICY_PATH)
+    parser.add_argument('--model', default=None, help="modèle RL (dense ou historique picklé)")
+    parser.add_argument('--snapshot', type=int, default=-1)
+    args = parser.parse_args()
+
+    q_tables = get_q_tables(args.model, args.snapshot)
+    policies = {name: GreedyPolicy.from_q_table(q) for name, q in q_tables.items()}
+    save_policies(policies, args.dst, *export_source(args.model, args.snapshot))
+    print(f"{len(policies)} politique(s) écrite(s) dans {args.dst} ({os.path.getsize(args.dst)/1e6:.1f} Mo)")
@@ -0,0 +1,234 @@
+# === reseau.py ===
+# Politique des IA par approximation de fonction : un petit modèle NumPy
+# (linéaire, ou une couche cachée tanh) donne les 21 Q-valeurs à partir
+# de l'état normalisé. Quelques Ko de poids par IA, une valeur pour tout
+# état (pas d'état inconnu joué au hasard), et des coups calculés par lot
+# pour tous les sièges d'un coup. Même interface que politique.GreedyPolicy :
+# get_policies charge un fichier .net comme une politique exportée.
+#
+# Les poids sont ajustés sur les Q-valeurs des états connus d'un snapshot
+# (moindres carrés pour le linéaire, Adam pour la couche cachée).
+#
+#   python reseau.py --model modele_ia_beauty_contest --hidden 16
+#   python reseau.py modele_lineaire.net --hidden 0
+import argparse
+import json
+import os
+import struct
+
+import numpy as np
+
+from modele import export_source, get_q_tables
+from moteur import N_ACTIONS, get_rng, rng_choice
+
+NET_PATH = "modele_ia_beauty_contest.net"
+
+MAGIC = b"LMSN"
+VERSION = 1
+_ALIGN = 64
+_PREFIX = struct.Struct("<4sHI")
+_ACTIONS = np.arange(N_ACTIONS) * 5
+_ALL_ACTIONS = [i*5 for i in range(N_ACTIONS)]
+
+MAX_ROUND = 50
+N_FEATURES = 6
+
+
+def features(lives, mean_others, mult_disc, round_number):
+    # (B, N_FEATURES) : vies et moyenne des autres /10, multiplicateur
+    # ramené à -1..1 (x0.5..x1.5), manche /50, et leurs produits avec le
+    # multiplicateur (le bon coup change de côté selon qu'il est < 1 ou > 1)
+    lives, mean_others, mult_disc, round_number = np.broadcast_arrays(
+        *(np.asarray(v, dtype=np.float32) for v in (lives, mean_others, mult_disc, round_number)))
+    own = lives / 10
+    others = mean_others / 10
+    mult = (mult_disc - 10) / 5
+    rounds = np.minimum(round_number, MAX_ROUND) / MAX_ROUND
+    return np.stack([own, others, mult, rounds, own * mult, others * mult], axis=-1).reshape(-1, N_FEATURES)
+
+
+class NetPolicy:
+    # layers : [(W, b), ...] ; tanh entre les couches, sortie linéaire
+    def __init__(self, layers):
+        self.layers = layers
+
+    def q_values(self, lives, mean_others, mult_disc, round_number):
+        x = features(lives, mean_others, mult_disc, round_number)
+        for i, (w, b) in enumerate(self.layers):
+            x = x @ w + b
+            if i < len(self.layers) - 1:
+                x = np.tanh(x)
+        return x
+
+    def __contains__(self, state):
+        return True
+
+    def __bool__(self):
+        return True
+
+    def choose_action(self, state, banned=(), epsilon=0, rng=None):
+        rng = get_rng(rng)
+        if rng.random() < epsilon:  # toujours tiré, comme moteur.choose_action
+            return rng_choice(rng, [a for a in _ALL_ACTIONS if a not in banned] or _ALL_ACTIONS)
+        q_vals = self.q_values(*state)[0]
+        for a in np.argsort(-q_vals, kind='stable'):
+            if a*5 not in banned:
+                return int(a)*5
+        return int(q_vals.argmax())*5
+
+    def choose_batch(self, lives, mean_others, mult_disc, round_number, banned, rng):
+        # Coups d'un lot d'états ; banned : (B,101) booléens (rng inutilisé)
+        q_vals = self.q_values(lives, mean_others, mult_disc, round_number)
+        allowed = ~banned[:, _ACTIONS]
+        allowed[~allowed.any(axis=1)] = True
+        return np.where(allowed, q_vals, -np.inf).argmax(axis=1) * 5
+
+    def n_weights(self):
+        return sum(w.size + b.size for w, b in self.layers)
+
+
+# =====================
+# Ajustement sur une Q-table
+# =====================
+def training_set(q_table):
+    # (états (N,4), Q-valeurs (N,21)) des états connus d'une Q-table (dict ou DenseQTable)
+    if hasattr(q_table, 'array'):
+        known = np.nonzero(~np.isnan(q_table.array[..., 0]))
+        states = np.stack(known, axis=1)
+        states[:, 2] += q_table.mult_min
+        return states, np.asarray(q_table.array[known], dtype=np.float64)
+    if not q_table:
+        return np.zeros((0, 4), dtype=np.int64), np.zeros((0, N_ACTIONS))
+    return np.array(list(q_table.keys()), dtype=np.int64), np.array(list(q_table.values()), dtype=np.float64)
+
+
+def fit(q_table, hidden=16, epochs=100, batch_size=256, lr=0.01, rng=None):
+    # NetPolicy dont les Q-valeurs approchent celles de la Q-table
+    rng = get_rng(rng)
+    states, targets = training_set(q_table)
+    if not len(states):
+        # rien à ajuster : la moyenne des cibles serait NaN et le réseau
+        # jouerait toujours 0 (GreedyPolicy joue ces états au hasard)
+        raise ValueError("Q-table vide : aucun état connu pour ajuster le réseau")
+    x = features(*states.T).astype(np.float64)
+    if hidden == 0:
+        # linéaire : moindres carrés
+        coef = np.linalg.lstsq(np.column_stack([x, np.ones(len(x))]), targets, rcond=None)[0]
+        return NetPolicy([(coef[:-1].astype(np.float32), coef[-1].astype(np.float32))])
+
+    params = [rng.normal(0, 1 / np.sqrt(N_FEATURES), (N_FEATURES, hidden)), np.zeros(hidden),
+              rng.normal(0, 1 / np.sqrt(hidden), (hidden, N_ACTIONS)), targets.mean(axis=0)]
+    moments = [(np.zeros_like(p), np.zeros_like(p)) for p in params]
+    beta1, beta2, step = 0.9, 0.999, 0
+    for _ in range(epochs):
+        order = rng.permutation(len(x))
+        for start in range(0, len(x), batch_size):
+            rows = order[start:start + batch_size]
+            w1, b1, w2, b2 = params
+            h = np.tanh(x[rows] @ w1 + b1)
+            err = (h @ w2 + b2 - targets[rows]) / len(rows)  # gradient de l'erreur quadratique / 2
+            dh = (err @ w2.T) * (1 - h * h)
+            grads = [x[rows].T @ dh, dh.sum(axis=0), h.T @ err, err.sum(axis=0)]
+            step += 1
+            for p, g, (m, v) in zip(params, grads, moments):
+                m *= beta1
+                m += (1 - beta1) * g
+                v *= beta2
+                v += (1 - beta2) * g * g
+                p -= lr * (m / (1 - beta1**step)) / (np.sqrt(v / (1 - beta2**step)) + 1e-8)
+    w1, b1, w2, b2 = (p.astype(np.float32) for p in params)
+    return NetPolicy([(w1, b1), (w2, b2)])
+
+
+def agreement(policy, q_table):
+    # (écart quadratique moyen des Q-valeurs, part des états où le meilleur coup est le même)
+    states, targets = training_set(q_table)
+    if not len(states):
+        return 0.0, 1.0
+    q_vals = policy.q_values(*states.T)
+    return float(np.sqrt(np.mean((q_vals - targets) ** 2))), float(np.mean(q_vals.argmax(axis=1) == targets.argmax(axis=1)))
+
+
+# =====================
+# Fichier .net
+# =====================
+def save_net(policies, path, snapshot=None, source=None):
+    # snapshot, source : comme politique.save_policies
+    names = list(policies.keys())
+    shapes = [[[list(w.shape), list(b.shape)] for w, b in policies[name].layers] for name in names]
+    header = {'version': VERSION, 'agents': names, 'shapes': shapes, 'n_features': N_FEATURES, 'snapshot': snapshot, 'source': source}
+    raw = json.dumps(header).encode()
+    offset = -(-(_PREFIX.size + len(raw)) // _ALIGN) * _ALIGN
+    raw = raw.ljust(offset - _PREFIX.size, b" ")
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, VERSION, len(raw)))
+        f.write(raw)
+        for name in names:
+            for w, b in policies[name].layers:
+                f.write(np.asarray(w, dtype='<f4').tobytes())
+                f.write(np.asarray(b, dtype='<f4').tobytes())
+    os.replace(tmp, path)
+
+
+def is_net_file(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def read_net_header(path=NET_PATH):
+    # (en-tête, position des poids)
+    with open(path, "rb") as f:
+        magic, version, size = _PREFIX.unpack(f.read(_PREFIX.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: fichier de réseau invalide")
+        return json.loads(f.read(size)), _PREFIX.size + size
+
+
+def load_net(path=NET_PATH):
+    # {nom: NetPolicy}
+    header, offset = read_net_header(path)
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = np.frombuffer(f.read(), dtype='<f4')
+    if header['n_features'] != N_FEATURES:
+        raise ValueError(f"{path}: {header['n_features']} variables d'état, {N_FEATURES} attendues")
+    policies = {}
+    pos = 0
+    for name, shapes in zip(header['agents'], header['shapes']):
+        layers = []
+        for w_shape, b_shape in shapes:
+            w_size, b_size = int(np.prod(w_shape)), int(np.prod(b_shape))
+            w = data[pos:pos + w_size].reshape(w_shape)
+            b = data[pos + w_size:pos + w_size + b_size].reshape(b_shape)
+            layers.append((w, b))
+            pos += w_size + b_size
+        policies[name] = NetPolicy(layers)
+    return policies
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Ajustement d'une politique par réseau sur les Q-tables")
+    parser.add_argument('dst', nargs='?', default=NET_PATH)
+    parser.add_argument('--model', default=None, help="modèle RL (dense ou historique picklé)")
+    parser.add_argument('--snapshot', type=int, default=-1)
+    parser.add_argument('--hidden', type=int, default=16, help="neurones de la couche cachée, 0 = linéaire")
+    parser.add_argument('--epochs', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    q_tables = get_q_tables(args.model, args.snapshot)
+    empty = [name for name, q_table in q_tables.items() if name != "Vous" and not len(training_set(q_table)[0])]
+    if empty:
+        parser.error(f"Q-table vide pour {', '.join(empty)} : entraînez ces IA avant d'en ajuster le réseau")
+    policies = {}
+    for name, q_table in q_tables.items():
+        if name == "Vous":
+            continue
+        policies[name] = fit(q_table, args.hidden, args.epochs, rng=rng)
+        rmse, same = agreement(policies[name], q_table)
+        print(f"{name}: {policies[name].n_weights()} poids, écart {rmse:.3f}, même meilleur coup {same:.1%}")
+    save_net(policies, args.dst, *export_source(args.model, args.snapshot))
+    print(f"{len(policies)} politique(s) écrite(s) dans {args.dst} ({os.path.getsize(args.dst)/1e3:.1f} Ko)")
@@ -1,32 +1,132 @@
 # === server.py ===
 # Prototype FastAPI + WebSocket pour Last-Man-Standing
+# Plusieurs salles par processus : {'type':'join','name':...,'room':CODE},
+# sans code une nouvelle salle est créée et son code renvoyé ('joined').
+# En fin de partie, {'type':'game_over','winner':...} puis la salle est
+# fermée : ses clients n'y sont plus rattachés et peuvent en rejoindre une autre.
+# Format négocié au join ('format':'msgpack', si msgpack est installé) :
+# trames binaires et round_result compact (sièges au lieu des noms, vies
+# des seuls joueurs qui ont changé) ; JSON complet sinon (client HTML).
+# Reprise : 'joined' donne un jeton ('token') ; une socket perdue garde son
+# siège RESUME_GRACE secondes, et {'type':'join','room':CODE,'token':...,'seq':N}
+# la rattache et rejoue les messages de salle après le n° N ('seq').
+# Parties rapides : {'type':'queue','name':...,'size':N,'ranked':true} met le
+# joueur en file (appariement.py) ; la salle se forme et démarre seule quand
+# N joueurs (du même niveau si ranked) attendent, ou au bout de
+# MATCH_TIMEOUT secondes avec des IA aux places libres. {'type':'leave_queue'}.
+# Sièges IA : {'type':'start_game','ai':N} ajoute N IA du modèle
+# (LMS_MODEL, sinon le modèle par défaut), chargé une fois par processus.
+# Résultats des parties dans la base SQLite du classement (LMS_CLASSEMENT),
+# lue par /leaderboard?n=20 et /leaderboard?player=NOM.
+# Métriques Prometheus sur /metrics (par worker), chronométrages en JSON
+# avec --timing-log.
+# Plusieurs workers : python serveur.py --workers 4 (bus.py relaie les
+# messages, chaque salle tourne sur le seul worker qui la possède).
+import argparse
 import asyncio
+import heapq
+import itertools
+import json
+import os
+import secrets
+import sqlite3
+import subprocess
 import sys
+import tempfile
+import time
+import zlib
+from collections import deque
+from contextlib import asynccontextmanager
 
 if sys.platform.startswith("win"):
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
 import uvicorn
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
 import random
-import math
 
-app = FastAPI()
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+import numpy as np
+
+from appariement import Matchmaker, skill_bracket
+from bus import LocalBus, make_bus, worker_channel
+from classement import CLASSEMENT_PATH, Leaderboard, classement_path, history, player_stats, top
+from journal import JOURNAL_PATH, GameLog
+from metriques import Counter, Gauge, Histogram, TimingLog, add_timing_hook, monitor_loop_lag, render
+from moteur import GameState, RuleSet, draw_multiplier, new_rng, new_seed
+from politique import get_policies
+
+bus = LocalBus()  # remplacé au démarrage si LMS_BUS est défini
+journal = GameLog('')  # journal et classement, ouverts au démarrage (LMS_JOURNAL, LMS_CLASSEMENT)
+
+@asynccontextmanager
+async def lifespan(app):
+    global bus, journal
+    bus = make_bus(os.environ.get('LMS_BUS'))
+    journal = GameLog(results=Leaderboard())
+    timing_log = None
+    if os.environ.get('LMS_TIMING_LOG'):
+        timing_log = TimingLog(os.environ['LMS_TIMING_LOG'])
+        add_timing_hook(timing_log)
+    await bus.start(on_bus_message)
+    lag_monitor = asyncio.create_task(monitor_loop_lag(LOOP_LAG, LOOP_LAG_LAST))
+    try:
+        yield
+    finally:
+        lag_monitor.cancel()
+        await bus.close()
+        journal.close()
+        if timing_log is not None:
+            timing_log.close()
+
+app = FastAPI(lifespan=lifespan)
 
 # =====================
 # Game state
 # =====================
-clients = {}  # websocket -> {name, lives}
-alive_clients = []
-rules_active = []
-available_rules = [1,2,3,4,5,6]
-MULTIPLIERS = [0.5,0.6,0.7,0.8,0.9,1.1,1.2,1.3,1.4,1.5]
-current_multiplier = None
-ROUND = 0
 DEFAULT_ROUND_TIME = 45
-forbidden_numbers = set()
-game_started = False  # le jeu ne démarre que quand le premier joueur clique sur "Lancer la partie"
+ROOM_CODE_LENGTH = 5
+ROOM_CODE_CHARS = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+SEND_QUEUE_SIZE = 64  # messages en attente max par client avant déconnexion
+TIMER_PUSH_EVERY = 5  # secondes entre deux envois du temps restant
+MAX_AI_SEATS = 50
+RESUME_GRACE = 30  # secondes pendant lesquelles un joueur déconnecté garde son siège
+REPLAY_SIZE = 64  # derniers messages de salle gardés pour les reprises
+AI_MODEL = os.environ.get('LMS_MODEL')  # modèle RL ou politique exportée des sièges IA
+BASE_SEED = int(os.environ['LMS_SEED']) if os.environ.get('LMS_SEED') else None  # --seed
+
+rooms = {}  # code -> GameRoom (salles possédées par ce worker)
+connections = {}  # id -> Connection des clients de ce worker
+remote_clients = {}  # (worker, id) -> RemoteConnection des clients relayés
+conn_ids = itertools.count()
+room_counter = itertools.count()
+
+# =====================
+# Metrics
+# =====================
+CLIENTS = Gauge('lms_connected_clients', "Clients WebSocket connectés à ce worker", lambda: len(connections))
+ROOMS = Gauge('lms_active_rooms', "Salles possédées par ce worker", lambda: len(rooms))
+ROOMS_PLAYING = Gauge('lms_rooms_playing', "Salles dont la partie est lancée", lambda: sum(r.started for r in rooms.values()))
+QUEUE_TOTAL = Gauge('lms_send_queue_depth', "Messages en attente dans les files d'envoi", lambda: sum(c.queue.qsize() for c in connections.values()))
+QUEUE_MAX = Gauge('lms_send_queue_depth_max', "File d'envoi la plus chargée", lambda: max((c.queue.qsize() for c in connections.values()), default=0))
+ROUND_RESOLVE = Histogram('lms_round_resolve_seconds', "Résolution d'une manche : scores, règles et journal")
+BROADCAST = Histogram('lms_broadcast_seconds', "Sérialisation et mise en file d'un message de salle")
+AI_DECISION = Histogram('lms_ai_decision_seconds', "Coups des sièges IA d'une salle")
+LOOP_LAG = Histogram('lms_event_loop_lag_seconds', "Retard de la boucle asyncio")
+LOOP_LAG_LAST = Gauge('lms_event_loop_lag_last_seconds', "Dernier retard mesuré de la boucle asyncio")
+ANSWERS = Counter('lms_answers_total', "Réponses valides reçues (rate() pour les réponses par seconde)")
+MESSAGES = Counter('lms_messages_sent_total', "Messages déposés dans les files d'envoi")
+DROPPED = Counter('lms_clients_dropped_total', "Clients déconnectés car leur file d'envoi était pleine")
+RESUMED = Counter('lms_sessions_resumed_total', "Clients rattachés à leur siège avec leur jeton")
+MATCH_WAITING = Gauge('lms_matchmaking_waiting', "Joueurs dans la file des parties rapides", lambda: len(matchmaker.waiting))
+MATCHES = Counter('lms_matches_formed_total', "Salles formées par la file des parties rapides")
+MATCH_AI = Counter('lms_matchmaking_ai_seats_total', "Sièges IA ajoutés aux salles formées après l'attente maximale")
+MATCH_WAIT = Histogram('lms_matchmaking_wait_seconds', "Attente dans la file avant la formation de la salle", (0.1, 0.5, 1, 2, 5, 10, 15, 20, 30, 60))
 
 # =====================
 # HTML frontend (simple)
@@ -44,11 +144,13 @@ body{font-family:sans-serif;margin:20px}
 <body>
 <h2>Last-Man-Standing</h2>
 <div>
-Pseudo: <input id="name"/><button onclick="join()">Rejoindre</button>
+Pseudo: <input id="name"/> Salle: <input id="room" size="6" placeholder="nouvelle"/><button onclick="join()">Rejoindre</button>
+ou partie rapide à <input type="number" id="size" min="2" max="50" value="4" size="3"/> joueurs <label><input type="checkbox" id="ranked"/>même niveau</label><button onclick="quickMatch()">Chercher</button>
 </div>
 <div id="game" style="display:none">
+<p>Salle: <b id="room_code"></b></p>
 <p id="info"></p>
-<button id="start_btn" onclick="startGame()" style="display:none">Lancer la partie</button>
+<div id="start_btn" style="display:none">IA: <input type="number" id="ai_input" min="0" max="50" value="0" size="3"/><button onclick="startGame()">Lancer la partie</button></div>
 <p id="round_info"></p>
 <p>Nombres interdits: <span id="forbidden"></span></p>
 <input type="number" id="number_input" min="0" max="100"/><button onclick="sendNumber()">Envoyer</button>
@@ -59,41 +161,89 @@ Pseudo: <input id="name"/><button onclick="join()">Rejoindre</button>
 <script>
 var ws;
 var is_first_player = false;
+var round_text = '';
+var token = null, last_seq = 0, room_code = '';
 function join(){
+    if(ws){ ws.onclose = null; ws.close(); }
+    token = null;
+    room_code = document.getElementById('room').value;
+    connect();
+}
+function quickMatch(){
+    if(ws){ ws.onclose = null; ws.close(); }
+    token = null;
+    room_code = '';
+    connect(true);
+}
+function connect(queue){
     var name = document.getElementById('name').value;
     ws = new WebSocket('ws://' + location.host + '/ws');
     ws.onopen = function(){
-        ws.send(JSON.stringify({'type':'join','name':name}));
+        if(queue){
+            ws.send(JSON.stringify({'type':'queue','name':name,'size':parseInt(document.getElementById('size').value) || 4,
+                                    'ranked':document.getElementById('ranked').checked}));
+        } else {
+            // avec un jeton : reprise du siège et des messages manqués
+            ws.send(JSON.stringify({'type':'join','name':name,'room':room_code,'token':token,'seq':last_seq}));
+        }
         document.getElementById('game').style.display='block';
     };
     ws.onmessage = function(event){
         var m = JSON.parse(event.data);
+        if(m.seq) last_seq = m.seq;
         handleMessage(m);
     };
+    ws.onclose = function(){
+        if(token) setTimeout(connect, 1000);
+    };
+}
+function showLives(lives){
+    var ul = document.getElementById('lives_list');
+    ul.innerHTML = '';
+    lives.forEach(p => {
+        var li = document.createElement('li');
+        li.innerText = p.name+': '+p.lives;
+        ul.appendChild(li);
+    });
 }
 function handleMessage(m){
-    if(m.type=='info'){
+    if(m.type=='joined'){
+        token = m.token;
+        room_code = m.room;
+        if(!m.resumed) last_seq = m.seq;
+        document.getElementById('room_code').innerText = m.room;
+    } else if(m.type=='game_over'){
+        // salle fermée : plus de reprise, un nouveau join crée ou rejoint une salle
+        token = null;
+        is_first_player = false;
+        document.getElementById('info').innerText = 'Partie terminée' + (m.winner ? ' : '+m.winner+' gagne' : '');
+    } else if(m.type=='queued'){
+        document.getElementById('info').innerText = 'En attente de joueurs ('+m.waiting+'/'+m.size+'), IA au bout de '+m.timeout+'s';
+    } else if(m.type=='players'){
+        showLives(m.names.map((name, i) => ({'name':name,'lives':m.lives[i]})));
+    } else if(m.type=='info'){
         document.getElementById('info').innerText = m.text;
         var log = document.getElementById('log');
         log.innerHTML += '<div>'+m.text+'</div>';
         log.scrollTop = log.scrollHeight;
         // si c'est le premier joueur, afficher le bouton "Lancer la partie"
+        if(m.text.includes('Le jeu a été lancé')){
+            is_first_player = true;
+            document.getElementById('start_btn').style.display='none';
+        }
         if(m.text.includes('a rejoint la partie') && !is_first_player){
             // si c'est le premier joueur connecté
             is_first_player = true;
             document.getElementById('start_btn').style.display='block';
         }
     } else if(m.type=='round_start'){
-        document.getElementById('round_info').innerText = 'Round '+m.round+': multiplier='+m.multiplier+', temps='+m.time+'s';
+        round_text = 'Round '+m.round+': multiplier='+m.multiplier;
+        document.getElementById('round_info').innerText = round_text+', temps='+m.time+'s';
         document.getElementById('forbidden').innerText = m.forbidden.join(',');
+    } else if(m.type=='timer'){
+        document.getElementById('round_info').innerText = round_text+', temps restant='+m.remaining+'s';
     } else if(m.type=='round_result'){
-        var ul = document.getElementById('lives_list');
-        ul.innerHTML = '';
-        m.lives.forEach(p => {
-            var li = document.createElement('li');
-            li.innerText = p.name+': '+p.lives;
-            ul.appendChild(li);
-        });
+        showLives(m.lives);
         var log = document.getElementById('log');
         log.innerHTML += '<div>Round '+m.round+' cible='+m.target+', plus proches: '+m.closest.join(',')+', éliminés: '+m.eliminated.join(',')+'</div>';
         if(m.new_rules.length>0){
@@ -107,7 +257,8 @@ function sendNumber(){
     ws.send(JSON.stringify({'type':'answer','value':v}));
 }
 function startGame(){
-    ws.send(JSON.stringify({'type':'start_game'}));
+    var ai = parseInt(document.getElementById('ai_input').value) || 0;
+    ws.send(JSON.stringify({'type':'start_game','ai':ai}));
     document.getElementById('start_btn').style.display='none';
 }
 </script>
@@ -116,102 +267,578 @@ function startGame(){
 """
 
 # =====================
-# Game functions
+# Connections
 # =====================
-async def broadcast(message):
-    remove = []
-    for ws in clients:
+FORMATS = ('json', 'msgpack') if msgpack is not None else ('json',)
+
+def encode(message, fmt='json'):
+    if fmt == 'msgpack':
+        return msgpack.packb(message)
+    return json.dumps(message, separators=(',',':'), ensure_ascii=False)
+
+def decode(message):
+    # message ASGI reçu : texte JSON ou trame binaire msgpack
+    if message.get('bytes') is not None:
+        if msgpack is None:
+            raise ValueError('trame binaire non supportée')
         try:
-            await ws.send_json(message)
-        except:
-            remove.append(ws)
-    for ws in remove:
-        await disconnect(ws)
-
-async def disconnect(ws):
-    if ws in clients:
-        name = clients[ws]['name']
-        del clients[ws]
-        await broadcast({'type':'info','text': f'{name} a quitté la partie'})
-
-async def game_loop():
-    global ROUND,current_multiplier,forbidden_numbers
-    await asyncio.sleep(1)
-    # assign lives
-    n_players = len(clients)
-    initial_lives = max(n_players*3,10 if n_players<=3 else n_players*3)
-    for ws in clients:
-        clients[ws]['lives'] = initial_lives
-    current_multiplier = random.choice(MULTIPLIERS)
-    await broadcast({'type':'info','text': f'Jeu démarré: {n_players} joueurs, {initial_lives} vies chacun. Multiplicateur initial = {current_multiplier}'})
+            return msgpack.unpackb(message['bytes'])
+        except Exception as e:
+            raise ValueError(f'msgpack invalide: {e}')
+    return json.loads(message.get('text') or '')
 
-    while True:
-        ROUND += 1
-        alive = [info for info in clients.values() if info['lives']>0]
-        if len(alive)<=1:
-            if alive:
-                winner = [ws for ws, info in clients.items() if info['lives']>0][0]
-                await broadcast({'type':'info','text': f'Le gagnant est {clients[winner]["name"]}!'})
-            break
-
-        # round parameters
-        if 1 in rules_active:
-            multiplier = random.choice(MULTIPLIERS)
-        else:
-            multiplier = current_multiplier
-        if 4 in rules_active:
-            round_time = random.randint(7,30)
-        else:
-            round_time = DEFAULT_ROUND_TIME
-        if 6 in rules_active:
-            forbidden_numbers = set(random.sample(range(101),20))
-        else:
-            forbidden_numbers = set()
-
-        await broadcast({'type':'round_start','round':ROUND,'multiplier':multiplier,'time':round_time,'forbidden': list(forbidden_numbers)})
-
-        # collect answers
-        answers = {}
-        end_time = asyncio.get_event_loop().time()+round_time
-        while asyncio.get_event_loop().time()<end_time:
-            for ws, info in clients.items():
-                if 'answer' in info:
-                    v = info.pop('answer')
-                    if 0<=v<=100 and v not in forbidden_numbers:
-                        answers[info['name']] = v
-            await asyncio.sleep(0.1)
-
-        # compute target
-        if answers:
-            avg = sum(answers.values())/len(answers)
-        else:
-            avg = 0
-        target = int(round(avg*multiplier))
-
-        # closest players
-        distances = {info['name']: abs(answers.get(info['name'],-9999)-target) for info in clients.values() if info['lives']>0}
-        if distances:
-            min_dist = min(distances.values())
-            closest = [n for n,d in distances.items() if d==min_dist]
+class Connection:
+    # Client WebSocket avec sa file d'envoi bornée et sa propre tâche d'écriture :
+    # un client lent ne retarde pas les autres, un client saturé est déconnecté.
+    def __init__(self, ws):
+        self.ws = ws
+        self.id = next(conn_ids)
+        self.format = 'json'
+        self.queue = asyncio.Queue(SEND_QUEUE_SIZE)
+        self.closed = False
+        self.room = None  # salle rejointe ou formée par la file
+        self.writer = asyncio.create_task(self._write())
+
+    def send(self, payload):
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(payload)
+            MESSAGES.inc()
+        except asyncio.QueueFull:
+            DROPPED.inc()
+            self.close()
+
+    def send_message(self, message):
+        self.send(encode(message, self.format))
+
+    async def _write(self):
+        try:
+            while True:
+                payload = await self.queue.get()
+                if isinstance(payload, bytes):
+                    await self.ws.send_bytes(payload)
+                else:
+                    await self.ws.send_text(payload)
+        except Exception:
+            self.close()
+
+    def detach(self, room):
+        # salle fermée : le client n'y est plus rattaché
+        if self.room is room:
+            self.room = None
+
+    def close(self):
+        # la boucle de réception de websocket_endpoint fait ensuite le ménage
+        if self.closed:
+            return
+        self.closed = True
+        if self.writer is not asyncio.current_task():
+            self.writer.cancel()
+        asyncio.create_task(self._close_socket())
+
+    async def _close_socket(self):
+        try:
+            await self.ws.close()
+        except Exception:
+            pass
+
+class RemoteConnection:
+    # Client d'un autre worker, vu par le propriétaire de la salle :
+    # ses messages repartent par le bus vers son worker
+    def __init__(self, worker, conn_id, fmt):
+        self.worker = worker
+        self.id = conn_id
+        self.format = fmt if fmt in FORMATS else 'json'
+        self.closed = False
+
+    def send(self, payload):
+        bus.publish(worker_channel(self.worker), {'op':'send','conn':self.id,'payload':payload})
+
+    def send_message(self, message):
+        self.send(encode(message, self.format))
+
+    def close(self):
+        bus.publish(worker_channel(self.worker), {'op':'close','conn':self.id})
+
+    def detach(self, room):
+        remote_clients.pop((self.worker, self.id), None)
+        bus.publish(worker_channel(self.worker), {'op':'detach','conn':self.id,'room':room.code})
+
+# =====================
+# Round timers
+# =====================
+class RoundTimers:
+    # Échéances de toutes les salles dans un seul tas, avec un seul minuteur
+    # de la boucle asyncio armé sur la plus proche : rien ne tourne entre deux
+    # échéances, quel que soit le nombre de salles.
+    def __init__(self):
+        self.heap = []  # [échéance, n°, callback] ; callback None = annulé
+        self.counter = itertools.count()
+        self.handle = None
+        self.armed_at = None
+
+    def add(self, when, callback):
+        entry = [when, next(self.counter), callback]
+        heapq.heappush(self.heap, entry)
+        if self.armed_at is None or when < self.armed_at:
+            self._arm()
+        return entry
+
+    def cancel(self, entry):
+        # retrait paresseux : l'entrée est ignorée quand elle arrive en tête
+        entry[2] = None
+
+    def _arm(self):
+        if self.handle is not None:
+            self.handle.cancel()
+        while self.heap and self.heap[0][2] is None:
+            heapq.heappop(self.heap)
+        if self.heap:
+            self.armed_at = self.heap[0][0]
+            self.handle = asyncio.get_running_loop().call_at(self.armed_at, self._fire)
         else:
-            closest = []
-        # apply lives
-        eliminated_now = []
-        for ws, info in clients.items():
-            if info['lives']>0:
-                if info['name'] in closest:
-                    continue
-                info['lives'] -= 1
-                if info['lives']<=0:
-                    eliminated_now.append(info['name'])
-                    # activate new rule
-                    if available_rules:
-                        r = random.choice(available_rules)
-                        available_rules.remove(r)
-                        rules_active.append(r)
-        lives_summary = [{'name':info['name'],'lives':info['lives']} for info in clients.values()]
-        await broadcast({'type':'round_result','round':ROUND,'target':target,'closest':closest,'eliminated':eliminated_now,'lives':lives_summary,'active_rules':rules_active,'new_rules':[]})
-        await asyncio.sleep(2)
+            self.handle = self.armed_at = None
+
+    def _fire(self):
+        now = asyncio.get_running_loop().time()
+        self.handle = self.armed_at = None
+        while self.heap and self.heap[0][0] <= now:
+            callback = heapq.heappop(self.heap)[2]
+            if callback is not None:
+                callback()
+        self._arm()
+
+timers = RoundTimers()
+matchmaker = Matchmaker(timers, lambda: asyncio.get_running_loop().time(),
+                        lambda players, n_ai: asyncio.create_task(form_match(players, n_ai)))
+
+# =====================
+# Game rooms
+# =====================
+class GameRoom:
+    def __init__(self, code, seed=None):
+        self.code = code
+        self.seed = room_seed() if seed is None else seed
+        self.rng = new_rng(self.seed)  # tous les tirages de la partie, IA comprises
+        self.clients = {}  # Connection -> session des clients connectés
+        self.sessions = {}  # jeton -> {name, seat, token, conn, expiry, seq}, connectés ou en sursis
+        self.seq = 0  # n° du dernier message de salle
+        self.history = deque(maxlen=REPLAY_SIZE)  # (n°, message, compact) pour les reprises
+        self.game = GameState([], 0)  # vies des joueurs, une ligne par siège
+        self.rules_active = RuleSet()
+        self.current_multiplier = None
+        self.round = 0
+        self.forbidden_numbers = set()
+        self.started = False  # le jeu ne démarre que quand un joueur clique sur "Lancer la partie"
+        self.closed = False  # salle fermée par close_room
+        self.winner = None  # nom du gagnant en fin de partie
+        self.task = None
+        self.record = None  # événements de la partie dans le journal
+        self.collecting = False  # manche ouverte : réponses dans game.round_choice
+        self.round_over = asyncio.Event()  # échéance passée ou tous les vivants ont répondu
+        self.sent_lives = None  # vies au dernier round_result, pour les deltas
+        self.n_ai = 0
+        self.ai_seats = np.zeros(0, dtype=np.int64)  # sièges IA, après ceux des clients
+        self.ai_policies = []  # politique de chaque siège IA
+        self.ai_agents = []  # agent du modèle de chaque siège IA
+
+    def broadcast(self, message, compact=None, replay=True):
+        # sérialisé une seule fois par format, puis déposé dans la file de chaque client ;
+        # compact : variante pour les clients non JSON (message None = clients JSON exclus).
+        # replay : numéroté et gardé pour les reprises (pas les envois du temps restant)
+        start = time.perf_counter()
+        if replay:
+            self.seq += 1
+            for m in (message, compact):
+                if m is not None:
+                    m['seq'] = self.seq
+            self.history.append((self.seq, message, compact))
+        payloads = {}
+        for conn in list(self.clients):
+            fmt = conn.format
+            if fmt not in payloads:
+                m = message if compact is None or fmt == 'json' else compact
+                payloads[fmt] = None if m is None else encode(m, fmt)
+            if payloads[fmt] is not None:
+                conn.send(payloads[fmt])
+        BROADCAST.observe(time.perf_counter() - start)
+
+    def players_message(self):
+        return {'type':'players','names':self.game.names,'lives':self.game.lives.tolist()}
+
+    def join(self, conn, name, token=None, seq=None):
+        info = self.sessions.get(token)
+        if info is not None:
+            self.resume(conn, info, seq)
+            return
+        token = secrets.token_urlsafe(12)
+        info = self.sessions[token] = {'name':name,'seat':None,'token':token,'conn':conn,'expiry':None,'seq':self.seq}
+        self.clients[conn] = info
+        conn.send_message({'type':'joined','room':self.code,'format':conn.format,'token':token,'seq':self.seq})
+        self.broadcast({'type':'info','text': f'{name} a rejoint la partie'})
+        if self.record is not None:
+            # sièges déjà attribués ; entre le lancement et leur attribution
+            # (chargement des IA), le nouveau venu a encore une place
+            conn.send_message({'type':'info','text': 'Partie en cours : vous êtes spectateur'})
+            if conn.format != 'json' and self.sent_lives is not None:
+                conn.send_message(self.players_message())
+
+    def resume(self, conn, info, seq=None):
+        # Client revenu avec son jeton : même siège, messages manqués rejoués,
+        # sans annonce aux autres joueurs
+        old = info['conn']
+        if old is not None:
+            # ancienne socket pas encore vue fermée : remplacée par la nouvelle
+            self.clients.pop(old, None)
+            old.close()
+        if info['expiry'] is not None:
+            timers.cancel(info['expiry'])
+            info['expiry'] = None
+        info['conn'] = conn
+        self.clients[conn] = info
+        RESUMED.inc()
+        conn.send_message({'type':'joined','room':self.code,'format':conn.format,'token':info['token'],'resumed':True})
+        if not isinstance(seq, int) or isinstance(seq, bool):
+            seq = info['seq']
+        if self.history and seq < self.history[0][0] - 1 and self.sent_lives is not None:
+            # trop de messages manqués : état des vies avant ceux qui restent
+            conn.send_message(self.players_message())
+        for n, message, compact in self.history:
+            m = message if compact is None or conn.format == 'json' else compact
+            if n > seq and m is not None:
+                conn.send_message(m)
+
+    def leave(self, conn, resume=False):
+        # resume : socket perdue, le siège est gardé RESUME_GRACE secondes
+        info = self.clients.pop(conn, None)
+        if info is None:
+            return
+        info['conn'] = None
+        if resume:
+            info['seq'] = self.seq
+            deadline = asyncio.get_running_loop().time() + RESUME_GRACE
+            info['expiry'] = timers.add(deadline, lambda: self._expire(info))
+            return
+        self._remove(info)
+
+    def _expire(self, info):
+        info['expiry'] = None
+        if info['conn'] is None:
+            self._remove(info)
+
+    def _remove(self, info):
+        if self.sessions.get(info['token']) is not info:
+            return
+        del self.sessions[info['token']]
+        if info['seat'] is not None and not self.task.done():
+            self.game.remove(info['seat'])
+            self.record.leave(self.round, info['seat'])
+            self._check_answers()
+        if not self.sessions:
+            close_room(self)
+            return
+        self.broadcast({'type':'info','text': f'{info["name"]} a quitté la partie'})
+
+    def start(self, n_ai=0):
+        if self.started:
+            return
+        self.started = True
+        self.n_ai = min(max(n_ai, 0), MAX_AI_SEATS) if isinstance(n_ai, int) and not isinstance(n_ai, bool) else 0
+        self.task = asyncio.create_task(self.game_loop())
+        self.broadcast({'type':'info','text': 'Le jeu a été lancé !'})
+
+    def answer(self, conn, value):
+        info = self.clients.get(conn)
+        if not self.collecting or info is None or info['seat'] is None:
+            return
+        seat = info['seat']
+        if self.game.lives[seat]>0 and isinstance(value,int) and not isinstance(value,bool) and 0<=value<=100 and value not in self.forbidden_numbers:
+            self.game.answer(seat, value)
+            ANSWERS.inc()
+            self._check_answers()
+
+    def _check_answers(self):
+        # la manche se termine dès que tous les joueurs vivants ont répondu
+        # (compteurs tenus par GameState, sans parcourir les sièges)
+        if self.collecting and self.game.all_answered():
+            self.round_over.set()
+
+    def ai_answers(self, multiplier):
+        # Coups de toutes les IA vivantes : états encodés en tableau, un appel
+        # vectorisé par agent (mêmes états que moteur.encode_state)
+        game = self.game
+        living = game.lives[self.ai_seats] > 0
+        seats = self.ai_seats[living]
+        if not len(seats):
+            return
+        lives = game.lives[seats]
+        mean_others = (game.lives_sum - lives) // max(game.n_alive - 1, 1)
+        banned = np.zeros((len(seats), 101), dtype=bool)
+        banned[:, list(self.forbidden_numbers)] = True
+        policies = [p for p, a in zip(self.ai_policies, living) if a]
+        for policy in set(policies):
+            k = np.array([p is policy for p in policies])
+            actions = policy.choose_batch(lives[k], mean_others[k], int(multiplier*10), self.round, banned[k], self.rng)
+            for seat, action in zip(seats[k].tolist(), actions.tolist()):
+                game.answer(seat, action)
+
+    async def load_ai(self):
+        # IA du modèle partagé (cache par processus), noms numérotés au-delà du nombre d'agents :
+        # (nom du siège, agent, politique)
+        if not self.n_ai:
+            return []
+        try:
+            policies = await asyncio.to_thread(get_policies, AI_MODEL)
+        except (OSError, ValueError, IndexError) as e:
+            self.broadcast({'type':'info','text': f'IA indisponibles : {e}'})
+            return []
+        agents = list(policies.items())
+        seats = []
+        for k in range(self.n_ai):
+            agent, policy = agents[k % len(agents)]
+            name = agent if k < len(agents) else f'{agent} ({k//len(agents)+1})'
+            seats.append((name, agent, policy))
+        return seats
+
+    def _push_timer(self, remaining):
+        # temps restant envoyé par le serveur : les clients n'ont pas de compte à rebours
+        return lambda: self.broadcast({'type':'timer','round':self.round,'remaining':remaining}, replay=False)
+
+    async def game_loop(self):
+        try:
+            await self.play()
+        finally:
+            close_room(self)
+
+    async def play(self):
+        await asyncio.sleep(1)
+        ai = await self.load_ai()
+        # assign lives
+        # joueurs : clients connectés et déconnectés encore en sursis
+        clients = self.sessions
+        n_players = len(clients) + len(ai)
+        initial_lives = max(n_players*3,10 if n_players<=3 else n_players*3)
+        game = self.game = GameState([info['name'] for info in clients.values()] + [name for name, _, _ in ai], initial_lives)
+        for seat, info in enumerate(clients.values()):
+            info['seat'] = seat
+        self.record = journal.game('serveur', game.names, initial_lives, self.seed, [None]*len(clients) + [agent for _, agent, _ in ai])
+        self.ai_seats = np.arange(len(clients), n_players)
+        self.ai_policies = [policy for _, _, policy in ai]
+        self.sent_lives = game.lives.copy()
+        self.broadcast(None, self.players_message())
+        self.current_multiplier = draw_multiplier(self.rng)
+        self.broadcast({'type':'info','text': f'Jeu démarré: {n_players} joueurs, {initial_lives} vies chacun. Multiplicateur initial = {self.current_multiplier}'})
+
+        while True:
+            self.round += 1
+            if game.alive_count()<=1:
+                alive = game.alive_indices()
+                if len(alive):
+                    self.winner = game.names[alive[0]]
+                    self.broadcast({'type':'info','text': f'Le gagnant est {self.winner}!'})
+                self.record.end(self.round-1, int(alive[0]) if len(alive) else None)
+                self.broadcast({'type':'info','text': f'Graine de la partie : {self.seed}'})
+                break
+
+            # round parameters, modifiés par les règles actives (1, 4, 6)
+            setup = self.rules_active.pre_round(self.current_multiplier, DEFAULT_ROUND_TIME, self.rng)
+            multiplier, round_time, self.forbidden_numbers = setup.multiplier, setup.round_time, setup.banned
+
+            # collect answers : fin du temps ou dès que tout le monde a répondu
+            game.new_round()
+            self.collecting = True
+            self.round_over.clear()
+            with AI_DECISION.time():
+                self.ai_answers(multiplier)
+            self._check_answers()
+            self.broadcast({'type':'round_start','round':self.round,'multiplier':multiplier,'time':round_time,'forbidden': list(self.forbidden_numbers)})
+            deadline = asyncio.get_running_loop().time() + round_time
+            entries = [timers.add(deadline, self.round_over.set)]
+            for remaining in range(round_time - TIMER_PUSH_EVERY, 0, -TIMER_PUSH_EVERY):
+                entries.append(timers.add(deadline - remaining, self._push_timer(remaining)))
+            try:
+                await self.round_over.wait()
+            finally:
+                for entry in entries:
+                    timers.cancel(entry)
+            choices = game.round_choice.copy()
+            self.collecting = False
+
+            # compute target, closest players and lives
+            start = time.perf_counter()
+            res = game.resolve(choices, multiplier, self.rules_active)
+            self.record.round(self.round, multiplier, self.rules_active, self.forbidden_numbers, choices, game.lives)
+            closest = [game.names[i] for i in res.winners.nonzero()[0]]
+            eliminated_now = []
+            eliminated_seats = []
+            new_rules = []
+            for i in game.newly_eliminated():
+                eliminated_now.append(game.names[i])
+                eliminated_seats.append(int(i))
+                # activate new rule
+                if game.alive_count()>2:
+                    r = game.activate_rule(self.rules_active, self.rng)
+                    if r is not None:
+                        new_rules.append(r)
+                        self.record.rule(self.round, r)
+            ROUND_RESOLVE.observe(time.perf_counter() - start)
+            lives_summary = [{'name':info['name'],'lives':int(game.lives[info['seat']])} for info in clients.values() if info['seat'] is not None]
+            lives_summary += [{'name':game.names[seat],'lives':int(game.lives[seat])} for seat in self.ai_seats.tolist()]
+            changed = (game.lives != self.sent_lives).nonzero()[0]
+            self.sent_lives = game.lives.copy()
+            compact = {'type':'round_result','round':self.round,'target':int(res.target),
+                       'closest':res.winners.nonzero()[0].tolist(),'eliminated':eliminated_seats,
+                       'lives':[[int(i),int(game.lives[i])] for i in changed],'new_rules':new_rules}
+            self.broadcast({'type':'round_result','round':self.round,'target':int(res.target),'closest':closest,'eliminated':eliminated_now,'lives':lives_summary,'active_rules':list(self.rules_active),'new_rules':new_rules}, compact)
+            await asyncio.sleep(2)
+
+
+class RemoteRoom:
+    # Salle possédée par un autre worker : les messages du client lui sont relayés
+    def __init__(self, code, owner):
+        self.code = code
+        self.owner = owner
+
+    def _forward(self, op, conn=None, **fields):
+        msg = {'op':op,'room':self.code,'worker':bus.worker_id,'conn':None if conn is None else conn.id}
+        msg.update(fields)
+        bus.publish(worker_channel(self.owner), msg)
+
+    def join(self, conn, name, token=None, seq=None):
+        self._forward('join', conn, name=name, format=conn.format, token=token, seq=seq)
+
+    def leave(self, conn, resume=False):
+        self._forward('leave', conn, resume=resume)
+
+    def start(self, n_ai=0):
+        self._forward('start', ai=n_ai)
+
+    def answer(self, conn, value):
+        self._forward('answer', conn, value=value)
+
+
+def on_bus_message(msg):
+    op = msg['op']
+    if op == 'send':
+        # message d'une salle distante pour un client de ce worker
+        conn = connections.get(msg['conn'])
+        if conn is not None:
+            conn.send(msg['payload'])
+        return
+    if op == 'close':
+        # client remplacé par une reprise sur un autre worker
+        conn = connections.get(msg['conn'])
+        if conn is not None:
+            conn.close()
+        return
+    if op == 'detach':
+        # salle distante fermée
+        conn = connections.get(msg['conn'])
+        if conn is not None and isinstance(conn.room, RemoteRoom) and conn.room.code == msg['room']:
+            conn.room = None
+        return
+
+    # message relayé vers une salle de ce worker
+    key = (msg['worker'], msg['conn'])
+    room = rooms.get(msg['room'])
+    if op == 'join':
+        if room is None:
+            # salle fermée entre la réclamation et le join : on la recrée
+            room = rooms[msg['room']] = GameRoom(msg['room'])
+            asyncio.create_task(bus.claim(room.code))
+        conn = remote_clients[key] = RemoteConnection(msg['worker'], msg['conn'], msg.get('format'))
+        room.join(conn, msg.get('name','Joueur'), msg.get('token'), msg.get('seq'))
+    elif op == 'leave':
+        conn = remote_clients.pop(key, None)
+        if room is not None and conn is not None:
+            room.leave(conn, msg.get('resume', False))
+    elif room is None:
+        return
+    elif op == 'start':
+        room.start(msg.get('ai', 0))
+    elif op == 'answer' and key in remote_clients:
+        room.answer(remote_clients[key], msg.get('value'))
+
+
+def room_seed():
+    # graine d'une nouvelle salle : suite de --seed si fourni, sinon aléatoire.
+    # Avec plusieurs workers, chacun a son compteur : l'identité du worker est
+    # mêlée à la suite, sinon la n-ième salle de chaque worker aurait la même graine
+    if BASE_SEED is None:
+        return new_seed()
+    n = next(room_counter)
+    if isinstance(bus, LocalBus):
+        return BASE_SEED + n
+    sequence = np.random.SeedSequence([BASE_SEED, zlib.crc32(bus.worker_id.encode()), n])
+    return int(sequence.generate_state(1, np.uint64)[0] >> 1)  # 63 bits, comme new_seed
+
+def new_room_code():
+    while True:
+        code = ''.join(random.choice(ROOM_CODE_CHARS) for _ in range(ROOM_CODE_LENGTH))
+        if code not in rooms:
+            return code
+
+async def get_room(code=None):
+    # Salle de ce worker (créée si le code est libre), salle distante si un
+    # autre worker la possède, sinon nouvelle salle
+    code = (code or '').strip().upper()
+    if code in rooms:
+        return rooms[code]
+    while True:
+        c = code or new_room_code()
+        owner = await bus.claim(c)
+        if owner == bus.worker_id:
+            if c not in rooms:
+                rooms[c] = GameRoom(c)
+            return rooms[c]
+        if code:
+            return RemoteRoom(c, owner)
+        # code tiré déjà pris par un autre worker : on en tire un autre
+
+async def form_match(players, n_ai):
+    # Salle formée par la file : les joueurs la rejoignent, les places de
+    # ceux partis entre-temps vont aux IA, et la partie démarre aussitôt
+    now = asyncio.get_running_loop().time()
+    room = await get_room()
+    for ticket in players:
+        conn = ticket['client']
+        MATCH_WAIT.observe(now - ticket['since'])
+        if conn.closed or conn.room is not None or matchmaker.waiting.get(conn) is not None:
+            n_ai += 1
+            continue
+        conn.room = room
+        room.join(conn, ticket['name'])
+    if not room.sessions:
+        close_room(room)
+        return
+    MATCHES.inc()
+    MATCH_AI.inc(n_ai)
+    room.start(n_ai)
+
+def close_room(room):
+    # Libère la salle : retirée du registre, boucle de jeu arrêtée, clients
+    # prévenus ('game_over') et détachés, sessions vidées ; plus rien ne
+    # référence la salle et sa partie
+    if room.closed:
+        return
+    room.closed = True
+    if rooms.get(room.code) is room:
+        del rooms[room.code]
+        bus.release(room.code)
+    if room.task is not None and room.task is not asyncio.current_task() and not room.task.done():
+        room.task.cancel()
+    for info in room.sessions.values():
+        if info['expiry'] is not None:
+            timers.cancel(info['expiry'])
+            info['expiry'] = None
+    if room.started:
+        room.broadcast({'type':'game_over','room':room.code,'winner':room.winner,'seed':room.seed}, replay=False)
+    for conn in room.clients:
+        conn.detach(room)
+    room.clients.clear()
+    room.sessions.clear()
+    room.history.clear()
 
 # =====================
 # Routes
@@ -220,32 +847,131 @@ async def game_loop():
 async def get():
     return HTMLResponse(html)
 
+@app.get('/metrics')
+async def metrics():
+    return PlainTextResponse(render(), media_type='text/plain; version=0.0.4')
+
+@app.get('/leaderboard')
+async def leaderboard(n: int = 20, player: str = None):
+    # lecture dans un thread : la base est en WAL, l'écrivain n'est pas bloqué
+    if not classement_path():
+        return {'players': []}
+    n = min(max(n, 1), 100)
+    if player:
+        rows = await asyncio.to_thread(history, player, None, n)
+        keys = ('game','source','ended','rounds','players','won','rounds_survived','elimination','left','agent')
+        return {'player': player, 'games': [dict(zip(keys, row)) for row in rows]}
+    rows = await asyncio.to_thread(top, None, n)
+    return {'players': [dict(zip(('name','agent','games','wins','rounds'), row)) for row in rows]}
+
 @app.websocket('/ws')
 async def websocket_endpoint(ws: WebSocket):
-    global game_started
     await ws.accept()
+    conn = Connection(ws)
+    connections[conn.id] = conn
     try:
-        while True:
-            data = await ws.receive_json()
+        while not conn.closed:
+            message = await ws.receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+            data = decode(message)
             t = data.get('type')
-            if t=='join':
-                name = data.get('name','Joueur')
-                clients[ws] = {'name':name,'lives':None}
-                await broadcast({'type':'info','text': f'{name} a rejoint la partie'})
-            elif t=='start_game' and not game_started:
-                game_started = True
-                asyncio.create_task(game_loop())
-                await broadcast({'type':'info','text': 'Le jeu a été lancé !'})
+            if t in ('join', 'queue'):
+                matchmaker.leave(conn)
+                if conn.room is not None:
+                    conn.room.leave(conn)
+                    conn.room = None
+                if data.get('format') in FORMATS:
+                    conn.format = data['format']
+                if t=='queue':
+                    await enqueue(conn, data)
+                else:
+                    await join_room(conn, data)
+            elif t=='leave_queue':
+                if matchmaker.leave(conn):
+                    conn.send_message({'type':'info','text':'Vous avez quitté la file'})
+            elif conn.room is None:
+                if t=='start_game':
+                    conn.send_message({'type':'info','text':'Aucune salle : rejoignez-en une ou créez-en une nouvelle'})
+                continue
+            elif t=='start_game':
+                conn.room.start(data.get('ai', 0))
             elif t=='answer':
-                if ws in clients:
-                    clients[ws]['answer'] = data.get('value')
-    except WebSocketDisconnect:
-        await disconnect(ws)
+                conn.room.answer(conn, data.get('value'))
+    except (WebSocketDisconnect, RuntimeError, ValueError, AttributeError):
+        pass
+    finally:
+        conn.close()
+        del connections[conn.id]
+        matchmaker.leave(conn)
+        if conn.room is not None:
+            conn.room.leave(conn, resume=True)
+
+async def join_room(conn, data):
+    # La salle n'est référencée que par conn.room : libérée dès sa fermeture
+    room = await get_room(data.get('room'))
+    if conn.room is not None:
+        return  # salle formée par la file pendant l'attente
+    conn.room = room
+    room.join(conn, data.get('name','Joueur'), data.get('token'), data.get('seq'))
+
+async def enqueue(conn, data):
+    # File des parties rapides ; ranked : niveau lu dans le classement (dans
+    # un thread, comme /leaderboard), une file par niveau
+    name = data.get('name','Joueur')
+    bracket = None
+    if data.get('ranked') and classement_path():
+        try:
+            bracket = skill_bracket(await asyncio.to_thread(player_stats, name))
+        except sqlite3.Error:
+            bracket = skill_bracket(None)
+        if conn.closed or conn.room is not None:
+            return
+    (size, bracket), waiting = matchmaker.join(conn, name, data.get('size'), bracket)
+    if conn.room is None and matchmaker.waiting.get(conn) is not None:
+        conn.send_message({'type':'queued','size':size,'bracket':bracket,'waiting':waiting,'timeout':matchmaker.timeout})
 
 # =====================
 # Run server
 # =====================
 if __name__=='__main__':
-    uvicorn.run(app,host='0.0.0.0',port=8000)
+    parser = argparse.ArgumentParser(description="Serveur Last-Man-Standing")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--journal', nargs='?', const=JOURNAL_PATH, default=None, help="journal des parties (désactivé par défaut ; sans valeur : parties.journal)")
+    parser.add_argument('--classement', nargs='?', const=CLASSEMENT_PATH, default=None, help="base SQLite du classement (désactivé par défaut ; sans valeur : classement.db)")
+    parser.add_argument('--seed', type=int, default=None, help="graine de la première salle, +1 par salle suivante (mêlée à l'identité du worker si --workers > 1)")
+    parser.add_argument('--timing-log', default=None, help="fichier JSON lignes des chronométrages")
+    parser.add_argument('--bus', default=os.environ.get('LMS_BUS'),
+                        help="unix:/chemin ou redis://... ; par défaut un relais Unix local si --workers > 1")
+    args = parser.parse_args()
+    if args.journal is not None:
+        os.environ['LMS_JOURNAL'] = args.journal
+    if args.classement is not None:
+        os.environ['LMS_CLASSEMENT'] = args.classement
+    if args.seed is not None:
+        os.environ['LMS_SEED'] = str(args.seed)
+        BASE_SEED = args.seed
+    if args.timing_log:
+        os.environ['LMS_TIMING_LOG'] = args.timing_log
 
+    if args.workers <= 1:
+        uvicorn.run(app, host=args.host, port=args.port)
+        sys.exit()
 
+    broker = None
+    if not args.bus:
+        # relais Unix socket local, lancé pour la durée du serveur
+        path = os.path.join(tempfile.mkdtemp(), 'bus.sock')
+        broker = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bus.py'), '--socket', path])
+        while not os.path.exists(path) and broker.poll() is None:
+            time.sleep(0.05)
+        args.bus = 'unix:' + path
+    os.environ['LMS_BUS'] = args.bus
+    try:
+        uvicorn.run('serveur:app', host=args.host, port=args.port, workers=args.workers,
+                    app_dir=os.path.dirname(os.path.abspath(__file__)))
+    finally:
+        if broker is not None:
+            broker.terminate()
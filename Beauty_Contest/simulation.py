@@ -0,0 +1,183 @@
+# === simulation.py ===
+# Simulation Monte-Carlo de parties IA contre IA, sans interface.
+# Chaque partie est une ligne des tableaux NumPy, toutes les parties
+# avancent manche par manche en même temps et les parties finies sont
+# retirées du lot.
+#
+#   python simulation.py --games 100000 --json resultats.json
+import argparse
+import json
+import time
+
+import numpy as np
+
+from moteur import MULTIPLIERS, ALL_RULES, RULES, has_rule, resolve_round
+from politique import GreedyPolicy, get_policies
+
+MAX_ROUNDS = 50
+INITIAL_LIVES = 10
+BATCH_SIZE = 50000
+
+_MULTS = np.array(MULTIPLIERS)
+
+
+def _draw_banned(rng, g):
+    # Règle 6 : 20 nombres interdits par partie
+    banned = np.zeros((g, 101), dtype=bool)
+    picks = rng.random((g, 101)).argsort(axis=1)[:, :20]
+    np.put_along_axis(banned, picks, True, axis=1)
+    return banned
+
+
+def _activate_rules(rng, sel, rules, lives, rule_counts):
+    # Ajoute une règle au hasard aux parties sel (parmi les règles restantes)
+    bits = np.array(ALL_RULES)
+    remaining = ((rules[sel, None] >> bits) & 1) == 0
+    has_remaining = remaining.any(axis=1)
+    sel = sel[has_remaining]
+    remaining = remaining[has_remaining]
+    new = bits[np.where(remaining, rng.random(remaining.shape), -1).argmax(axis=1)]
+    rules[sel] |= 1 << new
+    np.add.at(rule_counts, new, 1)
+    # Effet immédiat de chaque règle (règle 5) sur les parties qui l'ont tirée
+    for r in ALL_RULES:
+        rows = sel[new == r]
+        if len(rows):
+            sub = lives[rows]
+            RULES[r].on_activate(sub, rng)
+            lives[rows] = sub
+
+
+def simulate(policies, n_games, rng, max_rounds=MAX_ROUNDS, lives=INITIAL_LIVES):
+    # Joue n_games parties entre les IA de policies (une par siège)
+    n = len(policies)
+    lives = np.full((n_games, n), lives, dtype=np.int64)
+    eliminated = np.zeros((n_games, n), dtype=bool)
+    rules = np.zeros(n_games, dtype=np.int64)
+    multiplier = rng.choice(_MULTS, n_games)
+    length = np.zeros(n_games, dtype=np.int64)
+    out_round = np.full((n_games, n), max_rounds + 1, dtype=np.int64)  # manche d'élimination
+    rule_counts = np.zeros(max(ALL_RULES) + 1, dtype=np.int64)
+    active = np.arange(n_games)
+
+    for round_number in range(1, max_rounds + 1):
+        n_alive = (lives[active] > 0).sum(axis=1)
+        active = active[n_alive > 1]
+        if len(active) == 0:
+            break
+        length[active] = round_number
+
+        # Manche 5 : forcer une règle si aucune active
+        if round_number == 5:
+            alive = (lives[active] > 0).sum(axis=1)
+            forced = active[(rules[active] == 0) & (alive > 2)]
+            _activate_rules(rng, forced, rules, lives, rule_counts)
+
+        # Règle 1 : multiplicateur qui change
+        change = active[has_rule(rules[active], 1)]
+        multiplier[change] = rng.choice(_MULTS, len(change))
+
+        # Règle 6 : nombres interdits
+        banned = np.zeros((len(active), 101), dtype=bool)
+        rule6 = has_rule(rules[active], 6)
+        banned[rule6] = _draw_banned(rng, int(rule6.sum()))
+
+        # Choix des IA à partir de leur état
+        cur = lives[active]
+        alive = cur > 0
+        n_alive = alive.sum(axis=1)
+        lives_sum = np.where(alive, cur, 0).sum(axis=1)
+        mult_disc = (multiplier[active] * 10).astype(np.int64)
+        choices = np.full(cur.shape, -1, dtype=np.int64)
+        for seat, policy in enumerate(policies):
+            rows = np.flatnonzero(alive[:, seat])
+            if len(rows) == 0:
+                continue
+            own = cur[rows, seat]
+            others = n_alive[rows] - 1
+            mean_others = np.where(others > 0, (lives_sum[rows] - own) // np.maximum(others, 1), 0)
+            choices[rows, seat] = policy.choose_batch(own, mean_others, mult_disc[rows], round_number, banned[rows], rng)
+
+        res = resolve_round(cur, choices, multiplier[active], rules[active])
+        lives[active] = res.lives
+
+        # Nouvelles éliminations -> nouvelles règles (plus de 2 survivants)
+        new_elim = (lives[active] <= 0) & ~eliminated[active]
+        eliminated[active] |= new_elim
+        rows, seats = np.nonzero(new_elim)
+        out_round[active[rows], seats] = round_number
+        k = new_elim.sum(axis=1)
+        still = (lives[active] > 0).sum(axis=1)
+        for j in range(int(k.max(initial=0))):
+            _activate_rules(rng, active[(k > j) & (still > 2)], rules, lives, rule_counts)
+
+    alive = lives > 0
+    winner = np.where(alive.sum(axis=1) == 1, alive.argmax(axis=1), -1)
+    return {'winner': winner, 'length': length, 'rules': rules, 'rule_counts': rule_counts, 'out_round': out_round}
+
+
+def run(q_tables, n_games, seed=None, batch_size=BATCH_SIZE, names=None):
+    # q_tables : {nom: Q-table, GreedyPolicy ou NetPolicy}
+    names = list(names or [name for name in q_tables.keys() if name != "Vous"])
+    policies = [q if hasattr(q, 'choose_batch') else GreedyPolicy.from_q_table(q)
+                for q in (q_tables[name] for name in names)]
+    rng = np.random.default_rng(seed)
+    wins = np.zeros(len(names), dtype=np.int64)
+    draws = 0
+    total_length = 0
+    rule_games = np.zeros(max(ALL_RULES) + 1, dtype=np.int64)
+    rule_counts = np.zeros(max(ALL_RULES) + 1, dtype=np.int64)
+    start = time.perf_counter()
+    done = 0
+    while done < n_games:
+        g = min(batch_size, n_games - done)
+        out = simulate(policies, g, rng)
+        w = out['winner']
+        wins += np.bincount(w[w >= 0], minlength=len(names))
+        draws += int((w < 0).sum())
+        total_length += int(out['length'].sum())
+        for r in ALL_RULES:
+            rule_games[r] += int(has_rule(out['rules'], r).sum())
+        rule_counts += out['rule_counts']
+        done += g
+    elapsed = time.perf_counter() - start
+    return {
+        'games': n_games,
+        'seconds': elapsed,
+        'win_rate': {name: wins[i] / n_games for i, name in enumerate(names)},
+        'no_winner_rate': draws / n_games,
+        'avg_length': total_length / n_games,
+        # part des parties où la règle a été activée
+        'rule_frequency': {r: rule_games[r] / n_games for r in ALL_RULES},
+        'rule_activations': {r: int(rule_counts[r]) for r in ALL_RULES},
+    }
+
+
+def print_report(report):
+    print(f"{report['games']} parties en {report['seconds']:.2f}s "
+          f"({report['games']/max(report['seconds'],1e-9):.0f} parties/s)")
+    print(f"Durée moyenne: {report['avg_length']:.2f} manches | Sans gagnant: {report['no_winner_rate']:.2%}")
+    print("Taux de victoire:")
+    for name, rate in sorted(report['win_rate'].items(), key=lambda kv: -kv[1]):
+        print(f"  {name:<20} {rate:.2%}")
+    print("Fréquence d'activation des règles:")
+    for r, freq in report['rule_frequency'].items():
+        print(f"  Règle {r}: {freq:.2%}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Simulation de parties IA contre IA")
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--model', default=None, help="politique exportée, réseau, modèle dense ou historique picklé")
+    parser.add_argument('--snapshot', type=int, default=-1)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--json', help="fichier de sortie JSON")
+    args = parser.parse_args()
+
+    policies = get_policies(args.model, args.snapshot)
+    report = run(policies, args.games, seed=args.seed, batch_size=args.batch_size)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
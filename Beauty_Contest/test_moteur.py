@@ -0,0 +1,100 @@
+# === test_moteur.py ===
+# Manches calculées à la main pour le moteur de résolution partagé
+# (moteur.resolve_round / GameState.resolve) : cas de base, duel 0/100,
+# règles 2, 3 et 5, et lot (G,N) identique aux parties une à une.
+#
+#   python -m pytest test_moteur.py
+import numpy as np
+
+from moteur import NO_CHOICE, GameState, RuleSet, resolve_round, rules_mask
+
+
+def lives_after(lives, choices, multiplier, rules=()):
+    return resolve_round(lives, choices, multiplier, rules_mask(rules)).lives.tolist()
+
+
+def test_closest_player_keeps_lives():
+    # moyenne 30 x 1.0 = 30 : distances 20, 10, 30
+    res = resolve_round([5, 5, 5], [10, 20, 60], 1.0)
+    assert res.target == 30
+    assert res.winners.tolist() == [False, True, False]
+    assert res.lives.tolist() == [4, 5, 4]
+
+
+def test_missing_answer_and_dead_players():
+    # sans réponse : perd sa vie ; mort : ignoré, moyenne 15 sur les deux réponses
+    assert lives_after([5, 5, 5, 0], [10, 20, NO_CHOICE, 90], 1.0) == [5, 5, 4, 0]
+
+
+def test_duel_zero_against_hundred():
+    # cible 40 : 0 serait le plus proche, mais en duel x<1 c'est 100 qui gagne
+    res = resolve_round([3, 3], [0, 100], 0.8)
+    assert res.duel
+    assert res.winners.tolist() == [False, True]
+    assert res.lives.tolist() == [2, 3]
+    # x>1 : 0 gagne (la cible 60 aurait donné 100)
+    assert lives_after([3, 3], [0, 100], 1.2) == [3, 2]
+    # x1 : pas de duel, cible 50, égalité
+    res = resolve_round([3, 3], [0, 100], 1.0)
+    assert not res.duel
+    assert res.lives.tolist() == [3, 3]
+    # à trois joueurs vivants, pas de duel
+    assert not resolve_round([3, 3, 3], [0, 100, 100], 0.8).duel
+
+
+def test_rule3_exact_hit():
+    # cible 40 atteinte par le siège 1 : les autres perdent 2 vies
+    res = resolve_round([5, 5, 5], [20, 40, 60], 1.0, rules_mask([3]))
+    assert res.exact.tolist() == [False, True, False]
+    assert res.lives.tolist() == [3, 5, 3]
+    assert lives_after([5, 5, 5], [20, 40, 60], 1.0) == [4, 5, 4]
+
+
+def test_rule2_farthest_protected():
+    # cible 30 : siège 1 le plus proche, siège 2 le plus éloigné protégé
+    assert lives_after([5, 5, 5], [10, 20, 60], 1.0, [2]) == [4, 5, 5]
+    # deux joueurs vivants seulement : plus de protection du plus éloigné
+    # (cible 30 x 0.8 = 24 : distances 14 et 26)
+    assert lives_after([5, 5, 0], [10, 50, NO_CHOICE], 0.8, [2]) == [5, 4, 0]
+
+
+def test_rule5_halves_lives():
+    # pertes 1, 0, 1 puis moitié arrondie au-dessus
+    res = resolve_round([6, 6, 6], [10, 20, 60], 1.0, rules_mask([5]))
+    assert res.halved
+    assert res.lives.tolist() == [3, 3, 3]
+    # éliminé : reste à 0
+    assert lives_after([1, 6, 6], [10, 20, 60], 1.0, [5]) == [0, 3, 3]
+
+
+def test_rule5_skipped_on_exact_and_duel():
+    res = resolve_round([6, 6, 6], [20, 40, 60], 1.0, rules_mask([3, 5]))
+    assert not res.halved
+    assert res.lives.tolist() == [4, 6, 4]
+    res = resolve_round([4, 4], [0, 100], 0.8, rules_mask([5]))
+    assert res.duel and not res.halved
+    assert res.lives.tolist() == [3, 4]
+
+
+def test_batch_matches_single_games():
+    rng = np.random.default_rng(16)
+    g, n = 500, 4
+    lives = rng.integers(0, 6, (g, n))
+    choices = np.where(rng.random((g, n)) < 0.1, NO_CHOICE, rng.integers(0, 101, (g, n)))
+    choices[:50, :] = [0, 100, NO_CHOICE, NO_CHOICE]  # duels possibles
+    lives[:50, 2:] = 0
+    multiplier = rng.choice([0.5, 0.8, 1.0, 1.2, 1.5], g)
+    rules = rng.integers(0, 64, g) << 1
+    batch = resolve_round(lives, choices, multiplier, rules)
+    for i in range(g):
+        single = resolve_round(lives[i], choices[i], multiplier[i], rules[i])
+        for field, value in zip(single._fields, single):
+            np.testing.assert_array_equal(getattr(batch, field)[i], value, err_msg=f"partie {i}, {field}")
+
+
+def test_game_state_resolve():
+    game = GameState(["a", "b", "c"], 5)
+    game.resolve([20, 40, 60], 1.0, RuleSet([3]))
+    assert game.lives.tolist() == [3, 5, 3]
+    assert game.last_choice.tolist() == [20, 40, 60]
+    assert game.n_alive == 3 and game.lives_sum == 11
@@ -0,0 +1,203 @@
+# === tournoi.py ===
+# Tournoi entre IA de snapshots différents, sans interface.
+# Chaque table (toutes les paires d'IA, ou tous les groupes de --seats IA)
+# joue --games parties avec simulation.simulate ; les tables sont
+# réparties sur un pool de processus. Chaque partie donne des duels :
+# survivre plus longtemps qu'un adversaire est une victoire contre lui,
+# être éliminés à la même manche (ou finir ensemble) un nul.
+#
+# Classement Elo par maximum de vraisemblance (Bradley-Terry, Newton) sur
+# tous les duels, avec un nul virtuel contre une IA moyenne pour garder
+# des notes finies. Intervalle à 95 % par l'information de Fisher, par
+# rapport à la moyenne du tournoi. À k places, les k - 1 duels d'une IA
+# dans une partie sont liés (son rang les fixe tous) : la variance est
+# multipliée par (k + 1) / 3, variance du rang sur celle de k - 1 duels
+# indépendants.
+#
+#   python tournoi.py --model modele_ia_beauty_contest --games 200
+#   python tournoi.py --snapshots 0 -1 --seats 5 --report tournoi.txt
+import argparse
+import itertools
+import json
+import math
+import multiprocessing as mp
+import os
+import sys
+import time
+
+import numpy as np
+
+from modele import default_path, is_dense, load_dense, load_history, read_header
+from moteur import new_rng
+from politique import GreedyPolicy, is_policy_file, load_policies
+from reseau import is_net_file, load_net
+from simulation import simulate
+
+GAMES_PER_TABLE = 200
+MAX_TABLES = 2000  # au-delà, tables tirées au hasard (chaque IA joue autant)
+ELO_BASE = 1500
+ELO_SCALE = 400 / math.log(10)
+PRIOR_GAMES = 1  # nul virtuel contre une IA à ELO_BASE
+
+
+def load_entrants(path=None, snapshots=None, agents=None):
+    # {"s<snapshot>/<nom>": politique} pour les snapshots demandés
+    # (None : tous ; indices négatifs depuis le dernier) et les IA demandées
+    path = path or default_path()
+    if is_policy_file(path):
+        found = {None: load_policies(path)}  # un seul snapshot exporté
+    elif is_net_file(path):
+        found = {None: load_net(path)}
+    elif is_dense(path):
+        ids = read_header(path)['snapshots']
+        found = {s: load_dense(path, s) for s in (ids if snapshots is None else [ids[s] if s < 0 else s for s in snapshots])}
+    else:
+        history_list = load_history(path)
+        ids = range(len(history_list))
+        found = {ids[s]: history_list[s] for s in (ids if snapshots is None else snapshots)}
+    entrants = {}
+    for s, tables in found.items():
+        for name, table in tables.items():
+            if name == "Vous" or (agents and name not in agents):
+                continue
+            label = name if s is None else f"s{s}/{name}"
+            entrants[label] = table if hasattr(table, 'choose_batch') else GreedyPolicy.from_q_table(table)
+    return entrants
+
+
+def schedule(n_entrants, seats, rng, max_tables=MAX_TABLES):
+    # Toutes les tables de `seats` IA distinctes, ou, si elles sont trop
+    # nombreuses, des tirages successifs où chaque IA joue une fois
+    if math.comb(n_entrants, seats) <= max_tables:
+        return list(itertools.combinations(range(n_entrants), seats))
+    tables = []
+    while len(tables) < max_tables:
+        order = rng.permutation(n_entrants)
+        tables += [tuple(sorted(order[i:i+seats].tolist())) for i in range(0, n_entrants - seats + 1, seats)]
+    return tables[:max_tables]
+
+
+_policies = None
+
+
+def _init(policies):
+    global _policies
+    _policies = policies
+
+
+def _play(task):
+    # Parties d'une table : (table, points des duels, victoires, parties)
+    task_id, table, n_games, seed = task
+    rng = new_rng(None if seed is None else [seed, task_id])
+    out = simulate([_policies[i] for i in table], n_games, rng)
+    survived = out['out_round']  # (parties, sièges), survivants = MAX_ROUNDS + 1
+    k = len(table)
+    points = np.zeros((k, k))
+    for u, v in itertools.permutations(range(k), 2):
+        points[u, v] = (survived[:, u] > survived[:, v]).sum() + 0.5 * (survived[:, u] == survived[:, v]).sum()
+    winner = out['winner']
+    wins = np.bincount(winner[winner >= 0], minlength=k)
+    return table, points, wins, n_games
+
+
+def fit_elo(points, prior=PRIOR_GAMES, iterations=100, design=1.0):
+    # points[i, j] : duels gagnés par i contre j (nuls comptés 1/2).
+    # P(i bat j) = 1 / (1 + exp(r_j - r_i)) ; renvoie (Elo, demi-largeur IC 95 %).
+    # design : facteur de variance des duels corrélés
+    games = points + points.T
+    r = np.zeros(len(points))
+    for _ in range(iterations):
+        p = 1 / (1 + np.exp(r[None, :] - r[:, None]))
+        anchor = 1 / (1 + np.exp(-r))
+        grad = (points - games * p).sum(axis=1) + prior * (0.5 - anchor)
+        w = games * p * (1 - p)
+        hess = np.diag(w.sum(axis=1) + prior * anchor * (1 - anchor)) - w
+        step = np.linalg.solve(hess, grad)
+        r += step
+        if np.abs(step).max() < 1e-9:
+            break
+    # écart à la moyenne du tournoi : le niveau commun n'est fixé que par
+    # le nul virtuel et n'a pas de sens pour un classement
+    center = np.eye(len(r)) - 1 / len(r)
+    stderr = np.sqrt(design * np.diag(center @ np.linalg.inv(hess) @ center))
+    return ELO_BASE + ELO_SCALE * r, 1.96 * ELO_SCALE * stderr
+
+
+def run(entrants, games=GAMES_PER_TABLE, seats=2, workers=None, seed=None, max_tables=MAX_TABLES):
+    # entrants : {nom: GreedyPolicy ou NetPolicy}
+    names = list(entrants)
+    if len(names) < seats:
+        raise ValueError(f"{len(names)} IA pour des tables de {seats}")
+    workers = workers or os.cpu_count() or 1
+    tables = schedule(len(names), seats, new_rng(seed), max_tables)
+    tasks = [(i, table, games, seed) for i, table in enumerate(tables)]
+    points = np.zeros((len(names), len(names)))
+    played = np.zeros(len(names), dtype=np.int64)
+    wins = np.zeros(len(names), dtype=np.int64)
+
+    start = time.perf_counter()
+    ctx = mp.get_context()
+    with ctx.Pool(workers, initializer=_init, initargs=([entrants[name] for name in names],)) as pool:
+        for table, table_points, table_wins, n_games in pool.imap_unordered(_play, tasks, chunksize=max(1, len(tasks) // (workers * 8))):
+            idx = np.array(table)
+            points[np.ix_(idx, idx)] += table_points
+            played[idx] += n_games
+            wins[idx] += table_wins
+    elapsed = time.perf_counter() - start
+
+    elo, ci = fit_elo(points, design=(seats + 1) / 3)
+    duels = (points + points.T).sum(axis=1)
+    ranking = [{'name': names[i], 'elo': float(elo[i]), 'ci95': float(ci[i]), 'games': int(played[i]),
+                'wins': int(wins[i]), 'duel_score': float(points[i].sum() / max(duels[i], 1))}
+               for i in np.argsort(-elo)]
+    # Elo moyen des IA de chaque snapshot
+    by_snapshot = {}
+    for row in ranking:
+        if '/' in row['name']:
+            by_snapshot.setdefault(row['name'].split('/')[0], []).append(row['elo'])
+    return {
+        'games': len(tables) * games,
+        'tables': len(tables),
+        'seats': seats,
+        'seconds': elapsed,
+        'ranking': ranking,
+        'snapshots': {s: float(np.mean(v)) for s, v in sorted(by_snapshot.items(), key=lambda kv: -np.mean(kv[1]))},
+    }
+
+
+def print_report(report, file=sys.stdout):
+    print(f"{report['games']} parties, {report['tables']} tables de {report['seats']} IA, en {report['seconds']:.1f}s "
+          f"({report['games']/max(report['seconds'],1e-9):.0f} parties/s)", file=file)
+    print(f"{'Rang':>4}  {'IA':<16} {'Elo':>6} {'IC 95 %':>8} {'Parties':>8} {'Victoires':>10} {'Duels':>7}", file=file)
+    for rank, row in enumerate(report['ranking'], 1):
+        print(f"{rank:>4}  {row['name']:<16} {row['elo']:>6.0f} {'±' + format(row['ci95'], '.0f'):>8} {row['games']:>8} "
+              f"{row['wins'] / max(row['games'], 1):>10.1%} {row['duel_score']:>7.1%}", file=file)
+    if len(report['snapshots']) > 1:
+        print("Elo moyen par snapshot :", file=file)
+        for s, elo in report['snapshots'].items():
+            print(f"  {s:<6} {elo:.0f}", file=file)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Tournoi entre snapshots des IA, classement Elo")
+    parser.add_argument('--model', default=None, help="historique picklé, modèle dense, politique exportée ou réseau")
+    parser.add_argument('--snapshots', type=int, nargs='*', default=None, help="indices des snapshots, par défaut tous")
+    parser.add_argument('--agents', nargs='*', default=None, help="noms des IA, par défaut toutes")
+    parser.add_argument('--games', type=int, default=GAMES_PER_TABLE, help="parties par table")
+    parser.add_argument('--seats', type=int, default=2, help="IA par table")
+    parser.add_argument('--max-tables', type=int, default=MAX_TABLES)
+    parser.add_argument('--workers', type=int, default=None, help="par défaut : tous les coeurs")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--report', help="fichier texte du classement")
+    parser.add_argument('--json', help="fichier de sortie JSON")
+    args = parser.parse_args()
+
+    entrants = load_entrants(args.model, args.snapshots, args.agents)
+    report = run(entrants, args.games, args.seats, args.workers, args.seed, args.max_tables)
+    print_report(report)
+    if args.report:
+        with open(args.report, "w") as f:
+            print_report(report, f)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)